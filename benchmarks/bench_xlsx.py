@@ -0,0 +1,56 @@
+"""
+对比 XLSX 读取方式的耗时：pd.read_excel（openpyxl 完整加载）与 read_xlsx（只读流式读取）
+
+用法:
+python benchmarks/bench_xlsx.py --rows 200000 --repeat 3
+"""
+import os
+import time
+import argparse
+import tempfile
+import numpy as np
+import pandas as pd
+import repo_path  # noqa: F401
+from datarecipe import read_xlsx
+
+def make_workbook(file_path, rows):
+    """生成包含整数、浮点、字符串、日期和缺失值的测试工作簿"""
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        'id': np.arange(rows),
+        'asin': [f"B0{i:08d}" for i in range(rows)],
+        'units': rng.integers(0, 500, rows),
+        'revenue': rng.random(rows) * 1000,
+        'date': pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 365, rows), unit='D'),
+        'note': np.where(rng.random(rows) < 0.3, None, 'ok'),
+    })
+    df.to_excel(file_path, index=False)
+
+def timeit(func, repeat):
+    """返回 repeat 次运行中的最短耗时（秒）"""
+    timings = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start_time)
+    return min(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file_path = os.path.join(tmp_dir, 'bench.xlsx')
+        make_workbook(file_path, args.rows)
+        print(f"测试文件：{args.rows} 行，{os.path.getsize(file_path) / 1024 ** 2:.1f} MB")
+
+        pandas_time = timeit(lambda: pd.read_excel(file_path), args.repeat)
+        fast_time = timeit(lambda: read_xlsx(file_path), args.repeat)
+
+    print(f"pd.read_excel : {pandas_time:.2f} 秒")
+    print(f"read_xlsx     : {fast_time:.2f} 秒 ({pandas_time / fast_time:.1f}x)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+检查 datarecipe 的导入开销：每条导入语句在新的解释器中执行，记录耗时和加载的重量级依赖
+
+导入 datarecipe 本身和只用 send_email 时不应加载任何重量级依赖，只用 sql_query 时不应加载 SP-API 和 Excel 相关的依赖，
+违反规则或 `import datarecipe` 超过 --max-seconds 时返回非零退出码。结果以 JSON 输出。
+
+用法:
+python benchmarks/check_import_time.py
+python benchmarks/check_import_time.py --repeat 5 --max-seconds 0.05 --output import_time.json
+"""
+import sys
+import json
+import argparse
+import subprocess
+from repo_path import ROOT
+
+HEAVY_MODULES = ('pandas', 'numpy', 'pyarrow', 'sqlalchemy', 'pymysql', 'requests', 'openpyxl', 'chardet', 'tqdm', 'yaml')
+
+# 导入语句 -> 不允许加载的依赖
+RULES = {
+    'import datarecipe': HEAVY_MODULES,
+    'from datarecipe import send_email': HEAVY_MODULES,
+    'from datarecipe import add_handler, MetricsCollector': HEAVY_MODULES,
+    'from datarecipe import sql_query': ('pymysql', 'requests', 'openpyxl', 'chardet', 'tqdm'),
+    'from datarecipe import local_to_df': ('sqlalchemy', 'pymysql', 'requests', 'openpyxl'),
+    'from datarecipe import fetch_sp_api_reports': ('openpyxl', 'tqdm'),
+}
+
+_PROBE = """
+import sys, time, json
+start_time = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - start_time
+print(json.dumps({{'seconds': elapsed, 'modules': [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+def measure_import(statement, repeat=3):
+    """在新的解释器中执行导入语句 repeat 次，返回 {'seconds': 最短耗时, 'modules': 加载的重量级依赖}"""
+    best = None
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, '-c', _PROBE.format(statement=statement, heavy=HEAVY_MODULES)],
+            capture_output=True, text=True, check=True, cwd=ROOT,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        if best is None or result['seconds'] < best['seconds']:
+            best = result
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--max-seconds', type=float, default=0.1, help="import datarecipe 允许的最长耗时(秒)")
+    parser.add_argument('--output', help="结果 JSON 的保存路径，默认输出到标准输出")
+    args = parser.parse_args()
+
+    results = []
+    failures = []
+    for statement, forbidden in RULES.items():
+        result = measure_import(statement, args.repeat)
+        loaded = [module for module in result['modules'] if module in forbidden]
+        results.append({'statement': statement, **result, 'forbidden_loaded': loaded})
+        print(f"{result['seconds']:.3f}s  {statement}", file=sys.stderr)
+        if loaded:
+            failures.append(f"{statement} 加载了 {loaded}")
+    if results[0]['seconds'] > args.max_seconds:
+        failures.append(f"import datarecipe 耗时 {results[0]['seconds']:.3f} 秒，超过 {args.max_seconds} 秒")
+
+    report = {'results': results, 'failures': failures}
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    else:
+        json.dump(report, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+
+    if failures:
+        print("导入开销检查未通过：", file=sys.stderr)
+        for failure in failures:
+            print(f"  {failure}", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
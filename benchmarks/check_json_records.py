@@ -0,0 +1,116 @@
+"""
+检查 s3_api.iter_json_records（手写的增量 JSON 解析器）：把各种文档随机切分成文本块后逐块解析，结果必须与 json.loads 一致
+
+文档包括模拟的 SP-API 报告和容易在块边界出错的值：被截断的数字（'-3' 与 '.0e+5'）、转义字符和 \\u 序列、
+字符串中的括号和逗号、嵌套数组、空数组、顶层为数组或标量的文档；切分方式包括逐字符切分和随机长度切分。
+不完整或格式错误的文档必须抛出 ValueError。发现不一致时输出随机种子和切分位置，并返回非零退出码。
+
+用法:
+python benchmarks/check_json_records.py
+python benchmarks/check_json_records.py --iterations 2000 --seed 42
+"""
+import sys
+import json
+import random
+import argparse
+import repo_path  # noqa: F401
+from datarecipe.s3_api import iter_json_records
+from datagen import make_report_payload
+
+EDGE_DOCUMENTS = [
+    {"values": [0, -3, -3.0, 3.5e-7, -1.25E+10, 12345678901234567890, 1.5, 0.0, -0, True, False, None]},
+    {"strings": ["", "a\"b", "back\\slash", "tab\tnew\nline", "中文", "emoji \U0001F600", "[]{},:", "\\u0041"]},
+    {"nested": [[1, [2, [3]]], {"a": {"b": [1, {"c": None}]}}, []], "scalar": 7, "empty": [], "obj": {}},
+    {"reportSpecification": {"reportType": "X"}, "rows": [{"k": i, "v": f"{i}" * (i % 7)} for i in range(50)]},
+    [{"id": 1}, {"id": -2.5}, [], "text", 0],
+    [],
+    {},
+    {"only": "scalar"},
+]
+
+MALFORMED_DOCUMENTS = ['{"a": [1, 2', '{"a": [1, 2]', '[1, 2', '{"a" 1}', '{"a": [{"b": 1}, {"b": ]}', '']
+
+def expected_records(document):
+    """按 iter_json_records 的约定由 json.loads 的结果推出应产出的 (键, 记录) 列表"""
+    if isinstance(document, list):
+        return [(None, item) for item in document]
+    records = []
+    for key, value in document.items():
+        if isinstance(value, list):
+            records.extend((key, item) for item in value)
+        else:
+            records.append((key, value))
+    return records
+
+def split_text(text, rng):
+    """把文本随机切分为块：逐字符、固定小块或随机长度，返回切分位置和块列表"""
+    style = rng.choice(('char', 'small', 'random'))
+    if style == 'char' or len(text) < 2:
+        cuts = list(range(1, len(text)))
+    elif style == 'small':
+        size = rng.randint(2, 8)
+        cuts = list(range(size, len(text), size))
+    else:
+        cuts = sorted(rng.sample(range(1, len(text)), min(len(text) - 1, rng.randint(1, 50))))
+    bounds = [0] + cuts + [len(text)]
+    return cuts, [text[start:end] for start, end in zip(bounds, bounds[1:])]
+
+def serialize(document, rng):
+    """随机选择缩进和分隔符序列化文档，覆盖有无空白的情况"""
+    indent = rng.choice((None, 0, 2))
+    separators = rng.choice(((',', ':'), (', ', ': '), (' , ', ' : ')))
+    return json.dumps(document, indent=indent, separators=separators, ensure_ascii=rng.random() < 0.5)
+
+def run_checks(iterations, seed):
+    """
+    按随机种子 seed 把每个文档随机切分 iterations 次后解析
+
+    返回:
+    - 元组 (检查次数, 失败信息列表)
+    """
+    rng = random.Random(seed)
+    documents = EDGE_DOCUMENTS + [make_report_payload(20, missing_every=3)]
+    failures = []
+    checked = 0
+    for index, document in enumerate(documents):
+        expected = expected_records(json.loads(json.dumps(document)))
+        for _ in range(iterations):
+            text = serialize(document, rng)
+            cuts, chunks = split_text(text, rng)
+            try:
+                records = list(iter_json_records(chunks))
+            except Exception as e:
+                records = f"{type(e).__name__}: {e}"
+            checked += 1
+            if records != expected:
+                failures.append(f"文档 {index} 切分位置 {cuts[:20]}{'...' if len(cuts) > 20 else ''}：{str(records)[:200]}")
+                break
+
+    for text in MALFORMED_DOCUMENTS:
+        for _ in range(iterations):
+            cuts, chunks = split_text(text, rng) if text else ([], [])
+            try:
+                list(iter_json_records(chunks))
+            except ValueError:
+                checked += 1
+                continue
+            failures.append(f"格式错误的文档 {text!r} 切分位置 {cuts} 未抛出 ValueError")
+            break
+    return checked, failures
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=200, help="每个文档随机切分的次数")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    checked, failures = run_checks(args.iterations, args.seed)
+    print(f"已检查 {checked} 次解析", file=sys.stderr)
+    if failures:
+        print(f"iter_json_records 检查未通过（--seed {args.seed}）：", file=sys.stderr)
+        for failure in failures:
+            print(f"  {failure}", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
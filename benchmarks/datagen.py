@@ -0,0 +1,110 @@
+"""
+生成基准测试用的数据：CSV/XLSX 文件目录、含空值的 DataFrame 和嵌套结构的 SP-API 报告
+
+用法:
+python benchmarks/datagen.py --out ./bench_data --files 20 --rows 50000 --format csv
+"""
+import os
+import json
+import argparse
+import numpy as np
+import pandas as pd
+
+def make_frame(rows, seed=0, empty_rate=0.05):
+    """生成包含整数、浮点、中文字符串、日期、缺失值和空白字符串的测试数据"""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'id': np.arange(rows),
+        'asin': [f"B0{i:08d}" for i in range(rows)],
+        'store': rng.choice(['美国站', '加拿大站', '墨西哥站', 'UK'], rows),
+        'units': rng.integers(0, 500, rows),
+        'revenue': np.round(rng.random(rows) * 1000, 2),
+        'date': (pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 365, rows), unit='D')).strftime('%Y-%m-%d'),
+        'note': rng.choice(['ok', '补货中', '', '  '], rows),
+    })
+    if empty_rate:
+        df.loc[rng.random(rows) < empty_rate, 'revenue'] = np.nan
+        df.loc[rng.random(rows) < empty_rate, 'store'] = None
+    return df
+
+def make_csv_archive(directory, files=10, rows=10000, encoding='utf-8', prefix='sales'):
+    """
+    在 directory 下生成 files 个 CSV 文件，每个 rows 行
+
+    参数:
+    - encoding: 文件编码；为 'mixed' 时奇数文件使用 GB18030，用于覆盖编码识别
+
+    返回:
+    - 文件路径列表
+    """
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for i in range(files):
+        file_encoding = ('GB18030' if i % 2 else 'utf-8') if encoding == 'mixed' else encoding
+        path = os.path.join(directory, f"{prefix}_{i:04d}.csv")
+        make_frame(rows, seed=i).to_csv(path, index=False, encoding=file_encoding)
+        paths.append(path)
+    return paths
+
+def make_xlsx_archive(directory, files=4, rows=10000, prefix='sales'):
+    """在 directory 下生成 files 个 XLSX 文件，每个 rows 行，返回文件路径列表"""
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for i in range(files):
+        path = os.path.join(directory, f"{prefix}_{i:04d}.xlsx")
+        make_frame(rows, seed=i).to_excel(path, index=False)
+        paths.append(path)
+    return paths
+
+def make_report_payload(rows, missing_every=5):
+    """
+    生成结构与 GET_VENDOR_SALES_REPORT 一致的报告，金额为嵌套对象
+
+    参数:
+    - missing_every: 每隔多少行缺少一次 shippedCogs 字段，为0时不缺少
+    """
+    return {
+        "reportSpecification": {"reportType": "GET_VENDOR_SALES_REPORT"},
+        "salesAggregate": [],
+        "salesByAsin": [
+            {
+                "startDate": f"2024-09-{i % 28 + 1:02d}",
+                "endDate": f"2024-09-{i % 28 + 1:02d}",
+                "asin": f"B{i:09d}",
+                "customerReturns": i % 3,
+                "orderedRevenue": {"amount": round(i * 1.5, 2), "currencyCode": "USD"},
+                "orderedUnits": i % 17,
+                "shippedRevenue": {"amount": round(i * 1.2, 2), "currencyCode": "USD"},
+                "shippedUnits": i % 13,
+                **({"shippedCogs": {"amount": round(i * 0.8, 2), "currencyCode": "USD"}} if not missing_every or i % missing_every else {}),
+            }
+            for i in range(rows)
+        ],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--out', required=True, help="输出目录")
+    parser.add_argument('--files', type=int, default=10)
+    parser.add_argument('--rows', type=int, default=10000, help="每个文件或报告的行数")
+    parser.add_argument('--format', choices=['csv', 'xlsx', 'json'], default='csv')
+    parser.add_argument('--encoding', default='utf-8', help="CSV 编码，'mixed' 表示 UTF-8 与 GB18030 交替")
+    args = parser.parse_args()
+
+    if args.format == 'csv':
+        paths = make_csv_archive(args.out, args.files, args.rows, args.encoding)
+    elif args.format == 'xlsx':
+        paths = make_xlsx_archive(args.out, args.files, args.rows)
+    else:
+        os.makedirs(args.out, exist_ok=True)
+        paths = []
+        for i in range(args.files):
+            path = os.path.join(args.out, f"report_{i:04d}.json")
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(make_report_payload(args.rows), f)
+            paths.append(path)
+    total_bytes = sum(os.path.getsize(path) for path in paths)
+    print(f"已生成 {len(paths)} 个文件，共 {total_bytes / 1024 ** 2:.1f} MB：{args.out}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,222 @@
+"""
+本地模拟 SP-API Reports 接口，用于在不访问亚马逊的情况下运行 fetch_sp_api_reports
+
+支持 LWA 令牌、createReport、getReport、getReports、getReportDocument 和文档下载；报告在创建 processing_seconds 秒后变为 DONE，
+下载内容为 gzip 压缩的 JSON。设置 throttle_rate 时按该比例随机返回 429，设置 latency 时每个接口响应前等待该秒数（下载除外）。
+
+getReports 与真实接口一样校验参数：只接受 reportTypes、processingStatuses、marketplaceIds、pageSize、createdSince、createdUntil
+和 nextToken，未知参数（如 reportIds）返回 400；没有 nextToken 时必须指定 reportTypes（最多10种），翻页时 nextToken 必须是唯一的参数。
+结果按创建时间从新到旧排列，每页 pageSize 个（默认10，最多100）。
+
+用法:
+    python benchmarks/mock_sp_api.py --port 8000 --rows 1000
+    fetch_sp_api_reports(requests, access_token='mock', endpoint='http://127.0.0.1:8000')
+"""
+import argparse
+import gzip
+import json
+import random
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from datagen import make_report_payload
+
+REPORTS_PATH = "/reports/2021-06-30"
+
+GET_REPORTS_PARAMS = {'reportTypes', 'processingStatuses', 'marketplaceIds', 'pageSize', 'createdSince', 'createdUntil', 'nextToken'}
+
+class InvalidInput(Exception):
+    """请求参数不合法，对应真实接口的 400 InvalidInput"""
+
+def _parse_time(value):
+    """解析 ISO 8601 时间为时间戳"""
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        raise InvalidInput(f"Invalid date-time: {value}")
+
+def _format_time(timestamp):
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime('%Y-%m-%dT%H:%M:%S+00:00')
+
+class MockSPAPIServer:
+    """在后台线程运行的模拟服务，stats 记录每个操作的调用次数"""
+
+    def __init__(self, port=0, rows=1000, processing_seconds=1.0, throttle_rate=0.0, token_ttl=3600, latency=0.0):
+        self.processing_seconds = processing_seconds
+        self.latency = latency
+        self.token_ttl = token_ttl
+        self.throttle_rate = throttle_rate
+        self.document = gzip.compress(json.dumps(make_report_payload(rows)).encode('utf-8'))
+        self.reports = {}
+        self.pages = {}  # nextToken -> (剩余的 reportId 列表, pageSize)
+        self.stats = {}
+        self.lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', port), self._handler())
+        self.httpd.daemon_threads = True
+        self.endpoint = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        self.token_url = f"{self.endpoint}/auth/o2/token"
+
+    def __enter__(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def _count(self, operation):
+        with self.lock:
+            self.stats[operation] = self.stats.get(operation, 0) + 1
+
+    def _report(self, report_id):
+        report = self.reports.get(report_id)
+        if report is None:
+            return None
+        done = time.monotonic() - report['created'] >= self.processing_seconds
+        body = {
+            "reportId": report_id,
+            "reportType": report['reportType'],
+            "createdTime": _format_time(report['created_at']),
+            "processingStatus": "DONE" if done else "IN_PROGRESS",
+        }
+        if done:
+            body["reportDocumentId"] = f"doc-{report_id}"
+        return body
+
+    def _list_reports(self, query):
+        """按 getReports 的规则返回 (本页报告, nextToken)，参数不合法时抛出 InvalidInput"""
+        unknown = sorted(set(query) - GET_REPORTS_PARAMS)
+        if unknown:
+            raise InvalidInput(f"Unsupported parameters: {unknown}")
+
+        if 'nextToken' in query:
+            if len(query) > 1:
+                raise InvalidInput("nextToken must be the only parameter")
+            with self.lock:
+                page = self.pages.pop(query['nextToken'][0], None)
+            if page is None:
+                raise InvalidInput("Invalid nextToken")
+            report_ids, page_size = page
+        else:
+            report_types = [value for value in query.get('reportTypes', [''])[0].split(',') if value]
+            if not report_types:
+                raise InvalidInput("reportTypes or nextToken is required")
+            if len(report_types) > 10:
+                raise InvalidInput("At most 10 reportTypes are allowed")
+            page_size = int(query.get('pageSize', ['10'])[0])
+            if not 1 <= page_size <= 100:
+                raise InvalidInput("pageSize must be between 1 and 100")
+            created_since = _parse_time(query['createdSince'][0]) if 'createdSince' in query else time.time() - 90 * 86400
+            created_until = _parse_time(query['createdUntil'][0]) if 'createdUntil' in query else float('inf')
+            statuses = [value for value in query.get('processingStatuses', [''])[0].split(',') if value]
+            with self.lock:
+                candidates = sorted(self.reports.items(), key=lambda item: item[1]['created_at'], reverse=True)
+            report_ids = [
+                report_id for report_id, report in candidates
+                if report['reportType'] in report_types and created_since <= report['created_at'] <= created_until
+                and (not statuses or self._report(report_id)['processingStatus'] in statuses)
+            ]
+
+        next_token = None
+        if len(report_ids) > page_size:
+            next_token = uuid.uuid4().hex
+            with self.lock:
+                self.pages[next_token] = (report_ids[page_size:], page_size)
+        return [self._report(report_id) for report_id in report_ids[:page_size]], next_token
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, body=b'', content_type='application/json'):
+                if isinstance(body, (dict, list)):
+                    body = json.dumps(body).encode('utf-8')
+                    if server.latency:
+                        time.sleep(server.latency)
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _throttled(self, operation):
+                server._count(operation)
+                if server.throttle_rate and random.random() < server.throttle_rate:
+                    server._count('throttled')
+                    self._send(429, {"errors": [{"code": "QuotaExceeded"}]})
+                    return True
+                return False
+
+            def do_POST(self):
+                path = urlparse(self.path).path
+                if path == "/auth/o2/token":
+                    self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                    server._count('token')
+                    return self._send(200, {"access_token": f"mock-{uuid.uuid4().hex[:8]}", "expires_in": server.token_ttl})
+                if path != f"{REPORTS_PATH}/reports":
+                    return self._send(404, {})
+                body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+                if self._throttled('createReport'):
+                    return
+                report_id = uuid.uuid4().hex[:12]
+                with server.lock:
+                    server.reports[report_id] = {'created': time.monotonic(), 'created_at': time.time(), 'reportType': body.get('reportType')}
+                self._send(202, {"reportId": report_id})
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                path = url.path
+                if path == f"{REPORTS_PATH}/reports":
+                    if self._throttled('getReports'):
+                        return
+                    try:
+                        reports, next_token = server._list_reports(parse_qs(url.query))
+                    except (InvalidInput, ValueError) as e:
+                        return self._send(400, {"errors": [{"code": "InvalidInput", "message": str(e)}]})
+                    return self._send(200, {"reports": reports, **({"nextToken": next_token} if next_token else {})})
+                if path.startswith(f"{REPORTS_PATH}/reports/"):
+                    if self._throttled('getReport'):
+                        return
+                    report = server._report(path.rsplit('/', 1)[-1])
+                    return self._send(200, report) if report else self._send(404, {})
+                if path.startswith(f"{REPORTS_PATH}/documents/"):
+                    if self._throttled('getReportDocument'):
+                        return
+                    document_id = path.rsplit('/', 1)[-1]
+                    return self._send(200, {
+                        "reportDocumentId": document_id,
+                        "compressionAlgorithm": "GZIP",
+                        "url": f"{server.endpoint}/download/{document_id}",
+                    })
+                if path.startswith("/download/"):
+                    server._count('download')
+                    return self._send(200, server.document, 'application/octet-stream')
+                self._send(404, {})
+
+        return Handler
+
+def main():
+    parser = argparse.ArgumentParser(description="本地模拟 SP-API Reports 接口")
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--rows', type=int, default=1000, help="每个报告的行数")
+    parser.add_argument('--processing-seconds', type=float, default=1.0, help="报告从创建到 DONE 的时间")
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help="随机返回 429 的比例")
+    parser.add_argument('--latency', type=float, default=0.0, help="每个接口响应的延迟(秒)")
+    args = parser.parse_args()
+
+    with MockSPAPIServer(args.port, args.rows, args.processing_seconds, args.throttle_rate, latency=args.latency) as server:
+        print(f"模拟 SP-API 已启动：{server.endpoint}")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            print(f"调用次数：{server.stats}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,11 @@
+"""
+把仓库根目录加入 sys.path，直接运行 benchmarks/ 中的脚本时无需安装 datarecipe 或设置 PYTHONPATH
+
+在导入 datarecipe 之前导入：import repo_path
+"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
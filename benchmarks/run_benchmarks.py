@@ -0,0 +1,280 @@
+"""
+datarecipe 基准测试：在本地数据、SQLite 和模拟 SP-API 上测量主要函数的耗时分位数、吞吐量和峰值内存
+
+每个用例在独立的子进程中运行，峰值内存（ru_maxrss）只包含该用例；测试数据在父进程中生成一次，各用例共用。
+结果以 JSON 输出，可保存为基线，之后用 --baseline 对比，p50 变慢超过 --max-regression 时返回非零退出码。
+
+用法:
+python benchmarks/run_benchmarks.py --output results.json
+python benchmarks/run_benchmarks.py --cases local_to_df_csv check_empty --rows 200000
+python benchmarks/run_benchmarks.py --baseline results.json --max-regression 0.2
+"""
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import contextlib
+import multiprocessing
+import concurrent.futures
+import numpy as np
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Windows 没有 resource 模块，不记录峰值内存
+    resource = None
+
+import repo_path  # noqa: F401
+from datagen import make_frame, make_csv_archive, make_xlsx_archive
+
+CASES = {}
+
+def case(func):
+    """登记用例：func(args, data_dir) 是上下文管理器，产出 (被测函数, 每次处理的行数, 附加信息字典)"""
+    CASES[func.__name__] = contextlib.contextmanager(func)
+    return func
+
+@case
+def local_to_df_csv(args, data_dir):
+    from datarecipe import local_to_df
+    yield (
+        lambda: local_to_df(os.path.join(data_dir, 'csv'), 'sales', encoding_cache=None),
+        args.files * args.rows,
+        {},
+    )
+
+@case
+def local_to_df_xlsx(args, data_dir):
+    from datarecipe import local_to_df
+    yield (
+        lambda: local_to_df(os.path.join(data_dir, 'xlsx'), 'sales', encoding_cache=None),
+        args.xlsx_files * args.xlsx_rows,
+        {},
+    )
+
+@case
+def check_empty(args, data_dir):
+    from datarecipe import check_empty
+    df = make_frame(args.files * args.rows)
+    yield lambda: check_empty(df), len(df), {}
+
+@case
+def update(args, data_dir):
+    from datarecipe import update
+    from sqlite_standin import sqlite_standin
+    df = make_frame(args.files * args.rows, empty_rate=0)
+    with sqlite_standin(os.path.join(data_dir, f'update_{os.getpid()}.db')):
+        # 每次运行先按日期范围删除上一次写入的数据，再写入
+        yield lambda: update(df, 'bench', 'sales', date_col='date'), len(df), {}
+
+@case
+def sql_query(args, data_dir):
+    from datarecipe import sql_query
+    from sqlite_standin import sqlite_standin
+    df = make_frame(args.files * args.rows, empty_rate=0)
+    with sqlite_standin(os.path.join(data_dir, f'query_{os.getpid()}.db')) as engine:
+        df.to_sql('sales', engine, index=False)
+        yield lambda: sql_query('bench', 'SELECT * FROM sales WHERE units >= 0'), len(df), {}
+
+@contextlib.contextmanager
+def _mock_sp_api(args):
+    """启动模拟 SP-API，令牌也从模拟服务获取；放宽限流，只测量客户端本身的开销"""
+    import datarecipe.s3_api as s3_api
+    from mock_sp_api import MockSPAPIServer
+    server = MockSPAPIServer(
+        rows=args.report_rows,
+        processing_seconds=args.processing_seconds,
+        throttle_rate=args.throttle_rate,
+        latency=args.latency,
+    )
+    token_url = s3_api.LWA_TOKEN_URL
+    s3_api.LWA_TOKEN_URL = server.token_url
+    try:
+        with server:
+            client = s3_api.SPAPIClient('bench-client', 'bench-secret', 'bench-refresh-token', session=s3_api.get_session())
+            rate_limits = {operation: (1000, 1000) for operation in s3_api.RATE_LIMITS}
+            report_requests = [
+                {
+                    "name": f"report_{i}",
+                    "table": "vendor_sales",
+                    "body": {"reportType": "GET_VENDOR_SALES_REPORT", "marketplaceIds": ["ATVPDKIKX0DER"], "dataStartTime": f"2024-09-{i % 28 + 1:02d}"},
+                }
+                for i in range(args.reports)
+            ]
+            yield server, client, rate_limits, report_requests
+    finally:
+        s3_api.LWA_TOKEN_URL = token_url
+
+def _require_success(result):
+    results, all_success = result
+    if not all_success:
+        raise RuntimeError(f"报告未全部成功：{results}")
+
+@case
+def fetch_sp_api_reports(args, data_dir):
+    from datarecipe import fetch_sp_api_reports
+    with _mock_sp_api(args) as (server, client, rate_limits, report_requests):
+        yield (
+            lambda: _require_success(fetch_sp_api_reports(report_requests, client=client, endpoint=server.endpoint, rate_limits=rate_limits)),
+            args.reports * args.report_rows,
+            server.stats,
+        )
+
+@case
+def load_sp_api_reports_to_mysql(args, data_dir):
+    from datarecipe import load_sp_api_reports_to_mysql
+    from sqlite_standin import sqlite_standin
+    with _mock_sp_api(args) as (server, client, rate_limits, report_requests), \
+            sqlite_standin(os.path.join(data_dir, f'pipeline_{os.getpid()}.db')):
+        yield (
+            lambda: _require_success(load_sp_api_reports_to_mysql(
+                report_requests, 'bench', mode='append', client=client, endpoint=server.endpoint, rate_limits=rate_limits
+            )),
+            args.reports * args.report_rows,
+            server.stats,
+        )
+
+def _peak_rss_mb():
+    """当前进程的峰值常驻内存（MB）"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 以 KB 为单位，macOS 以字节为单位
+    return peak / 1024 ** 2 if sys.platform == 'darwin' else peak / 1024
+
+@contextlib.contextmanager
+def _quiet():
+    """屏蔽被测函数的打印和进度条"""
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        yield
+
+def run_case(name, options, data_dir):
+    """在子进程中运行一个用例，返回结果字典"""
+    args = argparse.Namespace(**options)
+    with CASES[name](args, data_dir) as (func, rows, extra):
+        setup_rss = _peak_rss_mb()
+        timings = []
+        for run in range(args.warmup + args.repeat):
+            with _quiet():
+                start_time = time.perf_counter()
+                func()
+                elapsed = time.perf_counter() - start_time
+            if run >= args.warmup:
+                timings.append(elapsed)
+        peak_rss = _peak_rss_mb()
+        extra = dict(extra)
+
+    p50, p90, p99 = np.percentile(timings, [50, 90, 99])
+    return {
+        'case': name,
+        'rows': rows,
+        'repeat': len(timings),
+        'latency_s': {
+            'min': min(timings),
+            'mean': float(np.mean(timings)),
+            'p50': float(p50),
+            'p90': float(p90),
+            'p99': float(p99),
+            'max': max(timings),
+        },
+        'throughput_rows_per_s': rows / p50 if p50 else None,
+        'setup_rss_mb': setup_rss,
+        'peak_rss_mb': peak_rss,
+        'extra': extra,
+    }
+
+def prepare_data(args, data_dir):
+    """生成文件类用例需要的测试数据，已存在时直接复用"""
+    csv_dir = os.path.join(data_dir, 'csv')
+    if 'local_to_df_csv' in args.cases and not os.path.isdir(csv_dir):
+        make_csv_archive(csv_dir, args.files, args.rows, encoding='mixed')
+    xlsx_dir = os.path.join(data_dir, 'xlsx')
+    if 'local_to_df_xlsx' in args.cases and not os.path.isdir(xlsx_dir):
+        make_xlsx_archive(xlsx_dir, args.xlsx_files, args.xlsx_rows)
+
+def compare(results, baseline_path, max_regression):
+    """对比基线的 p50，返回变慢超过 max_regression 的用例列表"""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = {result['case']: result for result in json.load(f)['results']}
+    regressions = []
+    for result in results:
+        base = baseline.get(result['case'])
+        if base is None:
+            continue
+        ratio = result['latency_s']['p50'] / base['latency_s']['p50'] - 1
+        result['vs_baseline'] = ratio
+        if ratio > max_regression:
+            regressions.append(result['case'])
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cases', nargs='+', choices=list(CASES), default=list(CASES))
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--warmup', type=int, default=1)
+    parser.add_argument('--files', type=int, default=8, help="CSV 文件数")
+    parser.add_argument('--rows', type=int, default=25000, help="每个 CSV 文件的行数；check_empty/update/sql_query 使用 files * rows 行")
+    parser.add_argument('--xlsx-files', type=int, default=2)
+    parser.add_argument('--xlsx-rows', type=int, default=10000)
+    parser.add_argument('--reports', type=int, default=8, help="每次请求的 SP-API 报告数")
+    parser.add_argument('--report-rows', type=int, default=20000, help="每个报告的行数")
+    parser.add_argument('--processing-seconds', type=float, default=0.2, help="模拟报告的生成时间")
+    parser.add_argument('--latency', type=float, default=0.02, help="模拟 SP-API 每个接口响应的延迟(秒)")
+    parser.add_argument('--throttle-rate', type=float, default=0.05, help="模拟 SP-API 随机返回 429 的比例")
+    parser.add_argument('--data-dir', help="测试数据目录，默认使用临时目录；指定后可在多次运行间复用")
+    parser.add_argument('--output', help="结果 JSON 的保存路径，默认输出到标准输出")
+    parser.add_argument('--baseline', help="作为对比基线的结果 JSON")
+    parser.add_argument('--max-regression', type=float, default=0.2, help="p50 相对基线允许变慢的比例")
+    args = parser.parse_args()
+
+    with contextlib.ExitStack() as stack:
+        data_dir = args.data_dir or stack.enter_context(tempfile.TemporaryDirectory())
+        os.makedirs(data_dir, exist_ok=True)
+        prepare_data(args, data_dir)
+
+        options = vars(args)
+        results = []
+        for name in args.cases:
+            print(f"运行 {name} ...", file=sys.stderr)
+            with concurrent.futures.ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+                result = executor.submit(run_case, name, options, data_dir).result()
+            results.append(result)
+            latency = result['latency_s']
+            peak_rss = f"{result['peak_rss_mb']:.0f} MB" if result['peak_rss_mb'] is not None else "未知"
+            print(
+                f"  p50 {latency['p50']:.3f}s  p90 {latency['p90']:.3f}s  "
+                f"{result['throughput_rows_per_s']:,.0f} 行/秒  峰值内存 {peak_rss}",
+                file=sys.stderr,
+            )
+
+    regressions = compare(results, args.baseline, args.max_regression) if args.baseline else []
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'options': {key: value for key, value in options.items() if key not in ('output', 'baseline')},
+        },
+        'results': results,
+        'regressions': regressions,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    else:
+        json.dump(report, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+
+    if regressions:
+        print(f"以下用例的 p50 相对基线变慢超过 {args.max_regression:.0%}：{regressions}", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
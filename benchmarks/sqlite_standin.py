@@ -0,0 +1,39 @@
+"""
+用本地 SQLite 代替 MySQL 运行 update、sql_query 和 load_sp_api_reports_to_mysql
+
+只替换 get_engine，写入和查询仍走 datarecipe 的代码；依赖 MySQL 语法的写入方式
+（load_data、multi_insert、upsert 等）在 SQLite 上不可用，基准测试只使用 to_sql 写入。
+
+用法:
+    with sqlite_standin('/tmp/bench.db') as engine:
+        update(df, 'bench', 'sales')
+"""
+import contextlib
+import sqlalchemy
+import repo_path  # noqa: F401
+import datarecipe.mysql
+import datarecipe.s3_api
+
+@contextlib.contextmanager
+def sqlite_standin(db_path=':memory:'):
+    """在上下文中把 get_engine 替换为指向 db_path 的 SQLite 引擎，返回该引擎"""
+    if db_path == ':memory:':
+        engine = sqlalchemy.create_engine(
+            'sqlite://', poolclass=sqlalchemy.pool.StaticPool, connect_args={'check_same_thread': False}
+        )
+    else:
+        engine = sqlalchemy.create_engine(f'sqlite:///{db_path}', connect_args={'timeout': 30})
+
+    def get_engine(*args, **kwargs):
+        return engine
+
+    modules = (datarecipe.mysql, datarecipe.s3_api)
+    originals = [module.get_engine for module in modules]
+    for module in modules:
+        module.get_engine = get_engine
+    try:
+        yield engine
+    finally:
+        for module, original in zip(modules, originals):
+            module.get_engine = original
+        engine.dispose()
@@ -1,23 +1,72 @@
 name = "datarecipe"
 
-from .common_tools import(
-    send_email,
-    local_to_df,
-    df_to_xlsx,
-    df_to_csv
-)
-
-from .mysql import(
-    update_data,
-    clear_db,
-    fetch_table_data,
-    sql_query
-)
-
-from .examine import(
-    check_empty
-)
-
-from .s3_api import(
-    fetch_sp_api_reports
-)
\ No newline at end of file
+import importlib
+
+# 公开名称 -> 所在子模块。子模块及其依赖（pandas、SQLAlchemy、requests、openpyxl 等）在首次访问时才导入，
+# 只用到 send_email 或 sql_query 的脚本不必加载其余部分
+_EXPORTS = {
+    'send_email': 'mail',
+
+    'local_to_df': 'common_tools',
+    'iter_local_frames': 'common_tools',
+    'df_to_xlsx': 'common_tools',
+    'df_to_csv': 'common_tools',
+    'df_to_parquet': 'common_tools',
+    'df_to_feather': 'common_tools',
+
+    'read_xlsx': 'xlsx_reader',
+
+    'clear_frame_cache': 'frame_cache',
+
+    'clear_query_cache': 'query_cache',
+
+    'clear_report_store': 'report_store',
+
+    'add_handler': 'instrumentation',
+    'remove_handler': 'instrumentation',
+    'LoggingHandler': 'instrumentation',
+    'MetricsCollector': 'instrumentation',
+
+    'update': 'mysql',
+    'sql_query': 'mysql',
+    'iter_sql_query': 'mysql',
+    'sql_query_to_file': 'mysql',
+    'get_engine': 'mysql',
+    'configure_pool': 'mysql',
+    'dispose_all': 'mysql',
+
+    'check_empty': 'examine',
+    'empty_summary': 'examine',
+
+    'fetch_sp_api_reports': 's3_api',
+    'fetch_sp_api_reports_async': 's3_api',
+    'iter_report_batches': 's3_api',
+    'spool_report': 's3_api',
+    'load_sp_api_reports_to_mysql': 's3_api',
+    'load_sp_api_reports_to_mysql_async': 's3_api',
+    'flatten_records': 's3_api',
+    'register_report_schema': 's3_api',
+    'SPAPIClient': 's3_api',
+    'get_client': 's3_api',
+}
+
+_SUBMODULES = {
+    'common_tools', 'xlsx_reader', 'disk_cache', 'frame_cache', 'query_cache', 'report_store',
+    'instrumentation', 'mail', 'mysql', 'examine', 's3_api',
+}
+
+__all__ = list(_EXPORTS)
+
+def __getattr__(attr):
+    """首次访问公开名称或子模块时导入对应的子模块，并缓存到包的命名空间"""
+    if attr in _EXPORTS:
+        value = getattr(importlib.import_module(f".{_EXPORTS[attr]}", __name__), attr)
+    elif attr in _SUBMODULES:
+        value = importlib.import_module(f".{attr}", __name__)
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {attr!r}")
+    globals()[attr] = value
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS) | _SUBMODULES)
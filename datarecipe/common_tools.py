@@ -1,76 +1,435 @@
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from email.mime.application import MIMEApplication
 import pandas as pd
 import glob
 import os
+import time
+import json
+import contextlib
+import concurrent.futures
 from tqdm import tqdm
 import chardet
+import pyarrow as pa
+import pyarrow.feather as feather
+from .frame_cache import DEFAULT_MAX_CACHE_BYTES, load_cached_frame, store_cached_frame, evict_frame_cache
+from .disk_cache import atomic_write, write_json
+from .instrumentation import span, emit
+from .mail import send_email
 
-def send_email(subject:str, body:str, send_email_address:str, send_email_password:str, receive_email_address:str, attachment_path=None, attachment_list=None, smtp_address='smtp.feishu.cn', smtp_port=465):
-    # Create a multipart message
-    msg = MIMEMultipart()
-    msg['From'] = send_email_address
-    msg['To'] = receive_email_address
-    msg['Subject'] = subject
-
-    # Add body text
-    msg.attach(MIMEText(body, 'plain'))
-    if attachment_path is not None and attachment_list is not None:
-        # Add multiple attachments
-        attachment_paths = [os.path.join(attachment_path, attachment) for attachment in attachment_list]
-        for each_path in attachment_paths:
-            attachment_filename = each_path.split("/")[-1]
-            with open(each_path, "rb") as f:
-                attach = MIMEApplication(f.read(), Name=attachment_filename)
-            attach['Content-Disposition'] = f'attachment; filename="{attachment_filename}"'
-            msg.attach(attach)
-
-    # Send the email
-    with smtplib.SMTP_SSL(smtp_address, smtp_port) as server:
-        server.login(send_email_address, send_email_password)
-        server.sendmail(send_email_address, receive_email_address, msg.as_string())
-
-def local_to_df(path, partial_file_name, skip_rows=0, keep_file_name=False, sheet_num=1, encoding='auto', sep=','):
-    all_data = pd.DataFrame()
-
-    # 获取匹配的文件列表，并为其添加进度条
-    file_list = list(glob.glob(f"{path}/**/*{partial_file_name}*.*", recursive=True))
-    
-    for file_name in tqdm(file_list, desc="Processing Files"):
-        _, file_extension = os.path.splitext(file_name)
-        file_extension = file_extension[1:]  # remove the leading dot
-        
+_EXECUTORS = {
+    'thread': concurrent.futures.ThreadPoolExecutor,
+    'process': concurrent.futures.ProcessPoolExecutor,
+}
+
+_SUPPORTED_EXTENSIONS = ('csv', 'xlsx')
+_XLSX_ENGINES = ('openpyxl', 'fast')
+
+# XLSX 单个工作表的行数上限（含表头）
+XLSX_MAX_ROWS = 1048576
+
+_COMPRESSION_SUFFIXES = {
+    'gzip': '.gz',
+    'bz2': '.bz2',
+    'zip': '.zip',
+    'xz': '.xz',
+    'zstd': '.zst',
+}
+
+# 编码缓存最多保留的文件数，超出时丢弃最早记录的文件
+ENCODING_CACHE_MAX_ENTRIES = 10000
+
+# 抽样识别的置信度低于该值时改为读取整个文件识别；整个文件识别的置信度仍低于该值时不写入缓存
+MIN_ENCODING_CONFIDENCE = 0.7
+
+# 整个文件识别时每次读取的字节数
+_DETECT_BLOCK_SIZE = 1048576
+
+# 抽样识别出的编码 -> 兼容的超集编码
+_ENCODING_SUPERSETS = {
+    'ascii': 'utf-8',
+    'GB2312': 'GB18030',
+    'GBK': 'GB18030',
+}
+
+def _file_signature(file_name):
+    """返回文件的 (大小, 修改时间纳秒)，用于判断缓存是否失效"""
+    stat = os.stat(file_name)
+    return stat.st_size, stat.st_mtime_ns
+
+def _feed_detector(blocks):
+    """把字节块依次交给 chardet 识别，识别结果确定后不再读取，返回 (编码, 置信度)"""
+    detector = chardet.UniversalDetector()
+    for block in blocks:
+        detector.feed(block)
+        if detector.done:
+            break
+    result = detector.close()
+    return result['encoding'], result['confidence']
+
+def _read_samples(file, file_size, sample_size, offsets):
+    """读取各偏移处的片段，首尾都裁剪到换行处，避免截断多字节字符"""
+    chunks = []
+    for offset in offsets:
+        offset = max(offset, 0)
+        file.seek(offset)
+        chunk = file.read(sample_size)
+        if offset > 0:
+            chunk = chunk[chunk.find(b'\n') + 1:]
+        if offset + sample_size < file_size:
+            chunk = chunk[:chunk.rfind(b'\n') + 1]
+        chunks.append(chunk)
+    return chunks
+
+def _detect_encoding(file_name, sample_size=65536, sample_middle=True, sample_tail=True):
+    """
+    识别文件编码，返回 (编码, 置信度)；抽样结果为空或置信度低于 MIN_ENCODING_CONFIDENCE 时改为读取整个文件识别
+    """
+    file_size = os.path.getsize(file_name)
+    with open(file_name, 'rb') as file:
+        offsets = [0]
+        if sample_middle:
+            offsets.append(file_size // 2)
+        if sample_tail:
+            offsets.append(file_size - sample_size)
+
+        if file_size > sample_size * len(offsets):
+            encoding, confidence = _feed_detector(_read_samples(file, file_size, sample_size, offsets))
+            if encoding is not None and confidence >= MIN_ENCODING_CONFIDENCE:
+                # 抽样只覆盖部分内容，替换为兼容范围更大的编码，避免未抽到的字符解码失败
+                return _ENCODING_SUPERSETS.get(encoding, encoding), confidence
+            file.seek(0)
+        encoding, confidence = _feed_detector(iter(lambda: file.read(_DETECT_BLOCK_SIZE), b''))
+    return _ENCODING_SUPERSETS.get(encoding, encoding), confidence
+
+def detect_encoding(file_name, sample_size=65536, sample_middle=True, sample_tail=True):
+    """
+    抽样识别文件编码，只读取文件头部（及可选的中部、尾部）固定大小的片段；
+    抽样无法识别或置信度低于 MIN_ENCODING_CONFIDENCE 时读取整个文件识别
+
+    参数:
+    - file_name: 文件路径
+    - sample_size: 每个片段读取的字节数，默认64KB
+    - sample_middle: 是否额外抽取文件中部片段
+    - sample_tail: 是否额外抽取文件尾部片段
+
+    返回:
+    - 编码名称，无法识别时返回None
+    """
+    return _detect_encoding(file_name, sample_size, sample_middle, sample_tail)[0]
+
+def _load_encoding_cache(cache_path):
+    """读取编码缓存文件，文件不存在或损坏时返回空字典"""
+    if not cache_path or not os.path.exists(cache_path):
+        return {}
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _save_encoding_cache(cache_path, cache):
+    """原子写入编码缓存文件"""
+    write_json(cache_path, cache)
+
+def _lookup_encoding(cache, file_name):
+    """从缓存中取出文件的编码，文件大小或修改时间变化时视为未命中"""
+    entry = cache.get(os.path.abspath(file_name))
+    if entry and entry.get('signature') == list(_file_signature(file_name)):
+        return entry['encoding']
+    return None
+
+def _remember_encoding(cache, file_name, encoding, confidence):
+    """
+    记录文件的编码识别结果，无法识别或置信度低于 MIN_ENCODING_CONFIDENCE 时不记录；
+    超过 ENCODING_CACHE_MAX_ENTRIES 个文件时丢弃最早记录的文件
+
+    返回:
+    - 是否记录
+    """
+    if encoding is None or confidence < MIN_ENCODING_CONFIDENCE:
+        return False
+    key = os.path.abspath(file_name)
+    cache.pop(key, None)
+    cache[key] = {'signature': list(_file_signature(file_name)), 'encoding': encoding}
+    for stale_key in list(cache)[:max(len(cache) - ENCODING_CACHE_MAX_ENTRIES, 0)]:
+        del cache[stale_key]
+    return True
+
+def _match_files(path, partial_file_name):
+    """获取目录下（含子目录）文件名包含 partial_file_name 且类型受支持的文件列表"""
+    file_list = glob.glob(f"{path}/**/*{partial_file_name}*.*", recursive=True)
+    return [file_name for file_name in file_list if os.path.splitext(file_name)[1][1:] in _SUPPORTED_EXTENSIONS]
+
+def _read_local_file(file_name, skip_rows=0, keep_file_name=False, sheet_num=1, encoding='auto', sep=',', xlsx_engine='openpyxl'):
+    """
+    读取单个本地文件，供 local_to_df 在线程池/进程池中调用
+
+    返回:
+    - 元组 (file_name, DataFrame 或 None, 耗时秒数, 自动识别出的 (编码, 置信度) 或None)，不支持的文件类型 DataFrame 为 None
+    """
+    start_time = time.perf_counter()
+    _, file_extension = os.path.splitext(file_name)
+    file_extension = file_extension[1:]  # remove the leading dot
+    detected_encoding = None
+
+    if file_extension == "csv":
         # 识别文件编码类型
-        if encoding=='auto':
-            with open(file_name, 'rb') as file:
-                result = chardet.detect(file.read())
-                encoding = result['encoding']
-        
-        if file_extension == "csv":
+        if encoding == 'auto':
+            with span('local_to_df.detect_encoding', file=file_name) as s:
+                detected_encoding = _detect_encoding(file_name)
+                encoding = detected_encoding[0]
+                s.set(encoding=encoding, confidence=detected_encoding[1])
+        with span('local_to_df.parse', file=file_name, format='csv', bytes=os.path.getsize(file_name)) as s:
             file_data = pd.read_csv(file_name, encoding=encoding, skiprows=skip_rows, sep=sep)
-        elif file_extension == "xlsx":
-            file_data = pd.read_excel(file_name, sheet_name=sheet_num - 1, skiprows=skip_rows)
-        else:
-            continue  # Skip unsupported file types
+            s.set(rows=len(file_data))
+    elif file_extension == "xlsx":
+        with span('local_to_df.parse', file=file_name, format='xlsx', bytes=os.path.getsize(file_name)) as s:
+            if xlsx_engine == 'fast':
+                from .xlsx_reader import read_xlsx  # openpyxl 只在处理 XLSX 时导入
+                file_data = read_xlsx(file_name, sheet_num, skip_rows)
+            else:
+                file_data = pd.read_excel(file_name, sheet_name=sheet_num - 1, skiprows=skip_rows)
+            s.set(rows=len(file_data))
+    else:
+        return file_name, None, time.perf_counter() - start_time, None  # Skip unsupported file types
+
+    if keep_file_name:
+        file_data["file_name"] = str(file_name)
+
+    return file_name, file_data, time.perf_counter() - start_time, detected_encoding
+
+def local_to_df(path, partial_file_name, skip_rows=0, keep_file_name=False, sheet_num=1, encoding='auto', sep=',', max_workers=None, executor_type='thread', report_timing=False, encoding_cache=None, frame_cache=None, frame_cache_format='feather', frame_cache_max_bytes=DEFAULT_MAX_CACHE_BYTES, xlsx_engine='openpyxl'):
+    """
+    读取目录下所有匹配的 CSV/XLSX 文件并合并为一个 DataFrame
+
+    文件在线程池或进程池中并发解析，全部完成后按文件列表顺序一次性合并。
 
-        if keep_file_name:
-            file_data["file_name"] = str(file_name)
+    参数:
+    - max_workers: 最大并发数，默认由 concurrent.futures 决定
+    - executor_type: 'thread' 使用线程池，'process' 使用进程池（适合大量 XLSX 等CPU密集的解析）
+    - report_timing: 为True时打印耗时最长的文件及总耗时
+    - encoding_cache: encoding='auto' 时编码识别结果的缓存文件路径，如 './cache/encoding_cache.json'，默认None不使用缓存；
+        置信度低的识别结果不写入缓存，最多保留 ENCODING_CACHE_MAX_ENTRIES 个文件
+    - frame_cache: 解析结果缓存目录，默认不启用；启用后只重新解析新增或变化的文件
+    - frame_cache_format: 缓存格式，'feather'（默认）或 'parquet'
+    - frame_cache_max_bytes: 缓存目录容量上限，超出后淘汰最久未使用的条目
+    - xlsx_engine: 'openpyxl'（默认，pd.read_excel）或 'fast'（read_xlsx 流式解析，适合大文件）
+    """
+    if executor_type not in _EXECUTORS:
+        raise ValueError(f"executor_type 仅支持 {list(_EXECUTORS)}，当前为：{executor_type}")
+    if xlsx_engine not in _XLSX_ENGINES:
+        raise ValueError(f"xlsx_engine 仅支持 {list(_XLSX_ENGINES)}，当前为：{xlsx_engine}")
 
-        all_data = pd.concat([all_data, file_data])
+    start_time = time.perf_counter()
+    # 获取匹配的文件列表
+    file_list = _match_files(path, partial_file_name)
+
+    # 每个文件单独识别编码，命中缓存的文件直接使用缓存结果
+    file_encodings = {file_name: encoding for file_name in file_list}
+    cache = _load_encoding_cache(encoding_cache) if encoding == 'auto' and encoding_cache else {}
+    if cache:
+        for file_name in file_list:
+            file_encodings[file_name] = _lookup_encoding(cache, file_name) or encoding
+
+    frames = [None] * len(file_list)
+    pending = list(enumerate(file_list))
+
+    # 命中解析结果缓存的文件直接读取缓存，不再解析
+    read_options = {'skip_rows': skip_rows, 'sheet_num': sheet_num, 'sep': sep, 'encoding': encoding, 'xlsx_engine': xlsx_engine}
+    if frame_cache:
+        pending = []
+        for index, file_name in enumerate(file_list):
+            file_data = load_cached_frame(frame_cache, file_name, read_options)
+            if file_data is None:
+                pending.append((index, file_name))
+                continue
+            if keep_file_name:
+                file_data["file_name"] = str(file_name)
+            frames[index] = file_data
+        print(f"缓存命中 {len(file_list) - len(pending)} 个文件，需要解析 {len(pending)} 个文件")
+
+    timings = {}
+    cache_updated = False
+    with _EXECUTORS[executor_type](max_workers=max_workers) as executor:
+        # 启用缓存时先缓存原始解析结果，再补充 file_name 列
+        future_to_index = {
+            executor.submit(_read_local_file, file_name, skip_rows, keep_file_name and not frame_cache, sheet_num, file_encodings[file_name], sep, xlsx_engine): index
+            for index, file_name in pending
+        }
+
+        # 按完成顺序更新进度条，结果按原顺序存放
+        for future in tqdm(concurrent.futures.as_completed(future_to_index), total=len(pending), desc="Processing Files"):
+            file_name, file_data, elapsed, detected_encoding = future.result()
+            if frame_cache and file_data is not None:
+                store_cached_frame(frame_cache, file_name, read_options, file_data, frame_cache_format)
+                if keep_file_name:
+                    file_data["file_name"] = str(file_name)
+            frames[future_to_index[future]] = file_data
+            timings[file_name] = elapsed
+            if detected_encoding and encoding_cache and _remember_encoding(cache, file_name, *detected_encoding):
+                cache_updated = True
+
+    if cache_updated:
+        _save_encoding_cache(encoding_cache, cache)
+    if frame_cache and pending:
+        evict_frame_cache(frame_cache, frame_cache_max_bytes)
+
+    if report_timing and timings:
+        print(f"共处理 {len(timings)} 个文件，累计解析耗时 {sum(timings.values()):.2f} 秒，耗时最长的文件：")
+        for file_name, elapsed in sorted(timings.items(), key=lambda item: item[1], reverse=True)[:10]:
+            print(f"  {elapsed:.2f}s  {file_name}")
+
+    frames = [frame for frame in frames if frame is not None]
+    all_data = pd.concat(frames) if frames else pd.DataFrame()
+    emit('local_to_df', duration=time.perf_counter() - start_time, files=len(file_list),
+         cache_hits=len(file_list) - len(pending), rows=len(all_data))
 
     if all_data.empty:
         print("No matching file in the path or empty data found")
         return None
     return all_data
 
-def df_to_xlsx(df, directory_path, file_name):
-    os.makedirs(directory_path, exist_ok=True)
+def iter_local_frames(path, partial_file_name, chunksize=100000, skip_rows=0, keep_file_name=True, sheet_num=1, encoding='auto', sep=',', encoding_cache=None):
+    """
+    逐块读取目录下所有匹配的 CSV/XLSX 文件，内存占用由 chunksize 决定而非文件总量
+
+    参数与 local_to_df 相同，另外:
+    - chunksize: 每个数据块的最大行数，默认100000
+
+    返回:
+    - 生成器，按文件顺序逐块产出 DataFrame；keep_file_name 为True时每块带有来源文件的 file_name 列
+
+    示例:
+    for chunk in iter_local_frames("./data", "sales"):
+        df_to_csv(chunk, "./output", "sales_all", mode='a')
+    """
+    file_list = _match_files(path, partial_file_name)
+    cache = _load_encoding_cache(encoding_cache) if encoding == 'auto' and encoding_cache else {}
+    cache_updated = False
+
+    try:
+        for file_name in tqdm(file_list, desc="Processing Files"):
+            _, file_extension = os.path.splitext(file_name)
+            file_extension = file_extension[1:]  # remove the leading dot
+
+            if file_extension == "csv":
+                file_encoding = encoding
+                if encoding == 'auto':
+                    file_encoding = _lookup_encoding(cache, file_name)
+                    if file_encoding is None:
+                        with span('iter_local_frames.detect_encoding', file=file_name) as s:
+                            file_encoding, confidence = _detect_encoding(file_name)
+                            s.set(encoding=file_encoding, confidence=confidence)
+                        if encoding_cache and _remember_encoding(cache, file_name, file_encoding, confidence):
+                            cache_updated = True
+                chunks = pd.read_csv(file_name, encoding=file_encoding, skiprows=skip_rows, sep=sep, chunksize=chunksize)
+            elif file_extension == "xlsx":
+                from .xlsx_reader import iter_xlsx_batches  # openpyxl 只在处理 XLSX 时导入
+                chunks = iter_xlsx_batches(file_name, sheet_num, skip_rows, chunksize)
+            else:
+                continue  # Skip unsupported file types
+
+            with contextlib.closing(chunks):
+                for chunk in chunks:
+                    if keep_file_name:
+                        chunk["file_name"] = str(file_name)
+                    emit('iter_local_frames.chunk', file=file_name, rows=len(chunk))
+                    yield chunk
+    finally:
+        if cache_updated:
+            _save_encoding_cache(encoding_cache, cache)
+
+def _xlsx_rows(df):
+    """把 DataFrame 逐行转换为 openpyxl 可写入的 Python 值，缺失值写为空单元格"""
+    values = df.astype(object).where(df.notna(), None)
+    return values.itertuples(index=False, name=None)
+
+def _write_xlsx_streaming(df, file_path, sheet_name='Sheet1', chunksize=50000):
+    """
+    以 openpyxl 只写模式逐块写入 XLSX，内存占用与数据量无关
+
+    超过单个工作表行数上限时自动拆分到 sheet_name_2、sheet_name_3 ...
+    """
+    from openpyxl import Workbook  # 只在写入 XLSX 时导入
+    workbook = Workbook(write_only=True)
+    rows_per_sheet = XLSX_MAX_ROWS - 1  # 每个工作表保留一行表头
+    header = [str(column) for column in df.columns]
+
+    for sheet_index, sheet_start in enumerate(range(0, max(len(df), 1), rows_per_sheet)):
+        worksheet = workbook.create_sheet(sheet_name if sheet_index == 0 else f"{sheet_name}_{sheet_index + 1}")
+        worksheet.append(header)
+        sheet_end = min(sheet_start + rows_per_sheet, len(df))
+        for chunk_start in range(sheet_start, sheet_end, chunksize):
+            for row in _xlsx_rows(df.iloc[chunk_start:min(chunk_start + chunksize, sheet_end)]):
+                worksheet.append(row)
+
+    workbook.save(file_path)
+
+def df_to_xlsx(df, directory_path, file_name, streaming=False, sheet_name='Sheet1'):
+    """
+    保存为 XLSX 文件，先写临时文件再原子替换
+
+    参数:
+    - streaming: 为True时使用只写模式逐块写入，内存占用恒定；行数超过工作表上限时自动启用并拆分工作表
+    - sheet_name: 工作表名称
+    """
     file_name = f"{file_name}.xlsx" if not file_name.endswith('.xlsx') else file_name
-    df.to_excel(os.path.join(directory_path, file_name), index=False)
+    with span('export', format='xlsx', file=file_name, rows=len(df)), \
+            atomic_write(os.path.join(directory_path, file_name)) as tmp_path:
+        if streaming or len(df) >= XLSX_MAX_ROWS:
+            _write_xlsx_streaming(df, tmp_path, sheet_name)
+        else:
+            df.to_excel(tmp_path, index=False, sheet_name=sheet_name, engine='openpyxl')
+
+def df_to_csv(df, directory_path, file_name, mode='w', chunksize=100000, compression='infer'):
+    """
+    保存为 CSV 文件
+
+    参数:
+    - mode: 'w' 覆盖写入（先写临时文件再原子替换），'a' 追加写入且不重复写表头
+    - chunksize: 每次写入的行数
+    - compression: 压缩格式，如 'gzip'、'bz2'、'zip'、'xz'、'zstd'，文件名自动添加对应后缀；默认按文件名后缀推断
+    """
+    file_name = f"{file_name}.csv" if not file_name.endswith('.csv') and '.csv.' not in file_name else file_name
+    suffix = _COMPRESSION_SUFFIXES.get(compression, '')
+    if compression and not file_name.endswith(suffix):
+        file_name = f"{file_name}{suffix}"
+    file_path = os.path.join(directory_path, file_name)
+
+    with span('export', format='csv', file=file_name, rows=len(df)):
+        if mode == 'a':
+            os.makedirs(directory_path, exist_ok=True)
+            # 追加模式下，文件已存在时不再重复写表头
+            header = not (os.path.exists(file_path) and os.path.getsize(file_path) > 0)
+            df.to_csv(file_path, index=False, mode=mode, header=header, chunksize=chunksize, compression=compression)
+        else:
+            # 先写入临时文件，zip 内的文件名需按目标文件名指定，否则会使用临时文件名
+            method = compression
+            if compression == 'infer':
+                method = next((name for name, suffix in _COMPRESSION_SUFFIXES.items() if file_name.endswith(suffix)), None)
+            if method == 'zip':
+                compression = {'method': 'zip', 'archive_name': file_name[:-len('.zip')]}
+            with atomic_write(file_path) as tmp_path:
+                df.to_csv(tmp_path, index=False, chunksize=chunksize, compression=compression)
+
+def df_to_parquet(df, directory_path, file_name, compression='snappy'):
+    """
+    保存为 Parquet 文件，先写临时文件再原子替换
+
+    参数:
+    - compression: 压缩格式，'snappy'（默认）、'zstd'、'gzip' 或 None
+    """
+    file_name = f"{file_name}.parquet" if not file_name.endswith('.parquet') else file_name
+    with span('export', format='parquet', file=file_name, rows=len(df)), \
+            atomic_write(os.path.join(directory_path, file_name)) as tmp_path:
+        df.to_parquet(tmp_path, index=False, compression=compression)
+
+def df_to_feather(df, directory_path, file_name, compression='lz4'):
+    """
+    保存为 Feather 文件，先写临时文件再原子替换
 
-def df_to_csv(df, directory_path, file_name):
-    os.makedirs(directory_path, exist_ok=True)
-    file_name = f"{file_name}.csv" if not file_name.endswith('.csv') else file_name
-    df.to_csv(os.path.join(directory_path, file_name), index=False)
\ No newline at end of file
+    参数:
+    - compression: 压缩格式，'lz4'（默认）、'zstd' 或 'uncompressed'
+    """
+    file_name = f"{file_name}.feather" if not file_name.endswith('.feather') else file_name
+    with span('export', format='feather', file=file_name, rows=len(df)), \
+            atomic_write(os.path.join(directory_path, file_name)) as tmp_path:
+        feather.write_feather(pa.Table.from_pandas(df, preserve_index=False), tmp_path, compression=compression)
@@ -0,0 +1,143 @@
+import os
+import json
+import time
+import glob
+import uuid
+import contextlib
+import pyarrow as pa
+
+# 帧缓存、查询缓存和报告仓库共用的文件操作：原子写入、记录使用时间、按最近使用时间淘汰。
+# 多个进程可能同时读写同一个目录，临时文件名唯一，文件随时可能被其他进程删除。
+
+# 缺少配对文件的数据/元数据可能正在被其他进程写入，超过该时间（秒）未修改才视为残留并删除
+ORPHAN_GRACE_SECONDS = 300
+
+@contextlib.contextmanager
+def atomic_write(file_path):
+    """
+    产出同目录下唯一的临时文件路径，with 块正常结束后原子替换目标文件，出错时删除临时文件，不留下不完整的文件
+
+    临时文件以 . 开头，不会被 glob 扫描到；以 'x' 模式创建，权限与直接写入目标文件时相同（受 umask 约束）。
+    """
+    directory = os.path.dirname(file_path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = os.path.join(directory, f".tmp_{uuid.uuid4().hex}{os.path.splitext(file_path)[1]}")
+    open(tmp_path, 'x').close()
+    try:
+        yield tmp_path
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def write_json(file_path, data):
+    """原子写入 JSON 文件"""
+    with atomic_write(file_path) as tmp_path:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, default=str)
+
+def write_columnar(file_path, write, description) -> bool:
+    """
+    用 write(临时文件路径) 原子写入 Parquet/Feather 文件
+
+    列名非字符串、列内类型混杂等无法按列式格式保存的数据打印警告后跳过。
+
+    参数:
+    - description: 警告中的说明，如 '查询结果无法写入缓存'
+
+    返回:
+    - 是否写入成功
+    """
+    try:
+        with atomic_write(file_path) as tmp_path:
+            write(tmp_path)
+    except (TypeError, ValueError, pa.ArrowException) as e:
+        print(f"警告：{description}，已跳过：{e}")
+        return False
+    return True
+
+def touch(file_path):
+    """记录最近使用时间，用于淘汰"""
+    try:
+        os.utime(file_path)
+    except FileNotFoundError:
+        pass
+
+def remove_files(*paths):
+    """删除文件，不存在（如已被其他进程删除）时忽略"""
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+def total_size(paths):
+    """文件总大小（字节），不存在的文件忽略"""
+    total = 0
+    for path in paths:
+        try:
+            total += os.path.getsize(path)
+        except FileNotFoundError:
+            pass
+    return total
+
+def expired_keys(directory, ttl):
+    """
+    返回元数据文件（{键}.json）已过期或损坏的条目键
+
+    过期按元数据中的 created 和条目写入时记录的 ttl 判断，没有记录 ttl 的条目使用参数 ttl。
+    """
+    now = time.time()
+    keys = []
+    for meta_path in glob.glob(os.path.join(directory, '*.json')):
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            expired = now - meta['created'] > meta.get('ttl', ttl)
+        except FileNotFoundError:
+            continue
+        except (OSError, ValueError, KeyError, TypeError):
+            expired = True
+        if expired:
+            keys.append(os.path.splitext(os.path.basename(meta_path))[0])
+    return keys
+
+def orphaned_files(paths, partner_suffix, grace=ORPHAN_GRACE_SECONDS):
+    """返回 paths 中缺少同名配对文件（后缀为 partner_suffix）且超过 grace 秒未修改的文件"""
+    now = time.time()
+    orphans = []
+    for path in paths:
+        if os.path.exists(os.path.splitext(path)[0] + partner_suffix):
+            continue
+        try:
+            if now - os.path.getmtime(path) > grace:
+                orphans.append(path)
+        except FileNotFoundError:
+            pass
+    return orphans
+
+def evict_lru(paths, max_bytes, remove=remove_files):
+    """
+    按最近使用时间从旧到新对 paths 中的文件调用 remove(path)，直到这些文件的总大小不超过 max_bytes
+
+    返回:
+    - 淘汰的文件数量
+    """
+    entries = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+
+    total_bytes = sum(size for _, size, _ in entries)
+    removed = 0
+    for _, size, path in sorted(entries):
+        if total_bytes <= max_bytes:
+            break
+        remove(path)
+        total_bytes -= size
+        removed += 1
+    return removed
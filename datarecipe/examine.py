@@ -1,30 +1,108 @@
-import numpy as np
+import pandas as pd
+from .instrumentation import span
 
-def check_empty(df, columns=None, output_cols=None):
+def _empty_mask(series: pd.Series) -> pd.Series:
+    """空值掩码：缺失值，以及文本列中为空或只含空白字符的字符串"""
+    mask = series.isna()
+    if series.dtype == object or isinstance(series.dtype, pd.StringDtype):
+        try:
+            stripped = series.str.strip()
+        except AttributeError:  # 对象列中没有字符串
+            return mask
+        # 非字符串元素经 .str 处理后为缺失值，不会被误判
+        mask |= stripped.eq('').to_numpy(dtype=bool, na_value=False)
+    return mask
+
+def _iter_chunks(data, chunksize=None):
+    """把 DataFrame 按 chunksize 行切片（不复制数据），DataFrame 迭代器原样逐块返回"""
+    if isinstance(data, pd.DataFrame):
+        if not chunksize:
+            yield data
+            return
+        for start in range(0, max(len(data), 1), chunksize):
+            yield data.iloc[start:start + chunksize]
+    else:
+        yield from data
+
+def _scan_empty(data, columns, sample_size, chunksize, keep_rows):
+    """逐块计算空值掩码并累计计数；keep_rows 为True时同时收集含空值的行"""
     if columns is not None and not isinstance(columns, list):
         columns = [columns]
-    # 创建临时DataFrame
-    tmp_df = df[columns].copy() if columns else df.copy()
 
-    # 替换空白字符串和None为 np.nan
-    tmp_df.replace(r'^\s*$', np.nan, regex=True, inplace=True)
-    tmp_df.fillna(value=np.nan, inplace=True)
+    total_rows = 0
+    rows = []
+    counts = {}
+    samples = {}
+    with span('examine.scan') as s:
+        for chunk in _iter_chunks(data, chunksize):
+            check_cols = columns if columns else list(chunk.columns)
+            any_empty = None
+            for col in check_cols:
+                mask = _empty_mask(chunk[col])
+                counts[col] = counts.get(col, 0) + int(mask.sum())
+                col_samples = samples.setdefault(col, [])
+                if len(col_samples) < sample_size and counts[col]:
+                    col_samples.extend(chunk.index[mask.to_numpy()][:sample_size - len(col_samples)].tolist())
+                any_empty = mask if any_empty is None else any_empty | mask
+            if keep_rows and any_empty is not None and any_empty.any():
+                rows.append(chunk[any_empty.to_numpy()])
+            total_rows += len(chunk)
+        s.set(rows=total_rows, columns=len(counts))
+
+    summary_columns = {}
+    for col, count in sorted(counts.items(), key=lambda item: item[1], reverse=True):
+        summary_columns[col] = {
+            'empty': count,
+            'ratio': count / total_rows if total_rows else 0.0,
+            'sample_rows': samples[col],
+        }
+    return {'total_rows': total_rows, 'columns': summary_columns}, rows
+
+def empty_summary(data, columns=None, sample_size=5, chunksize=None) -> dict:
+    """
+    按列统计空值（缺失值和空白字符串），可分块处理大表或 DataFrame 迭代器并合并计数
+
+    参数:
+    - data: DataFrame，或逐块产出 DataFrame 的迭代器（如 iter_local_frames / iter_sql_query）
+    - columns: 要检查的列，默认全部列
+    - sample_size: 每列记录的空值行索引样本数量
+    - chunksize: data 为 DataFrame 时每次处理的行数，默认整表一次处理
+
+    返回:
+    - {'total_rows': 总行数, 'columns': {列名: {'empty': 空值数量, 'ratio': 空值占比, 'sample_rows': [行索引]}}}
+    """
+    return _scan_empty(data, columns, sample_size, chunksize, keep_rows=False)[0]
+
+def check_empty(df, columns=None, output_cols=None, chunksize=None, sample_size=5, return_summary=False):
+    """
+    检查空值（缺失值和空白字符串）并打印各列的缺失占比
 
-    # 计算每列的缺失值数量
-    missing_counts = tmp_df.isnull().sum().sort_values(ascending=False)
+    参数:
+    - df: DataFrame，或逐块产出 DataFrame 的迭代器
+    - columns: 要检查的列，默认全部列
+    - output_cols: 返回的含空值行只保留这些列并去重
+    - chunksize: df 为 DataFrame 时每次处理的行数，默认整表一次处理
+    - sample_size: 摘要中每列记录的空值行索引样本数量
+    - return_summary: 为True时返回 empty_summary 格式的按列摘要
 
-    # 总行数
-    total_rows = len(df)
+    返回:
+    - 默认返回含空值的行，数据完整时返回 None；return_summary 为True时返回按列摘要
+    """
+    summary, rows = _scan_empty(df, columns, sample_size, chunksize, keep_rows=not return_summary)
 
     # 可视化缺失数据占比
-    if missing_counts.any():
+    if any(stats['empty'] for stats in summary['columns'].values()):
         print("缺失数据：")
-        for col, count in missing_counts.items():
-            num_chars = int((count / total_rows) * 10)  # 根据比例计算字符数量
-            print(f"{col}: {'█' * num_chars}{'.' * (10 - num_chars)} ({count} rows)")
-        null_data = df[tmp_df.isnull().any(axis=1)]
-        if output_cols: 
+        for col, stats in summary['columns'].items():
+            num_chars = int(stats['ratio'] * 10)  # 根据比例计算字符数量
+            print(f"{col}: {'█' * num_chars}{'.' * (10 - num_chars)} ({stats['empty']} rows)")
+        if return_summary:
+            return summary
+        null_data = pd.concat(rows) if len(rows) > 1 else rows[0]
+        if output_cols:
             null_data = null_data[output_cols].drop_duplicates()
         return null_data
     else:
-        print("DataFrame 数据完整。")
\ No newline at end of file
+        print("DataFrame 数据完整。")
+        if return_summary:
+            return summary
@@ -0,0 +1,105 @@
+import os
+import json
+import glob
+import hashlib
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+from .disk_cache import write_columnar, touch, remove_files, evict_lru
+
+# 缓存目录默认的容量上限（字节），超出后按最近使用时间淘汰
+DEFAULT_MAX_CACHE_BYTES = 5 * 1024 ** 3
+
+_SUFFIXES = {
+    'feather': '.feather',
+    'parquet': '.parquet',
+}
+
+def _path_prefix(file_name: str) -> str:
+    """同一源文件的所有缓存条目共用的文件名前缀"""
+    return hashlib.sha1(os.path.abspath(file_name).encode('utf-8')).hexdigest()[:16]
+
+def _entry_stem(file_name: str, read_options: dict) -> str:
+    """按 (路径, 大小, 修改时间, 读取参数) 生成缓存条目名"""
+    stat = os.stat(file_name)
+    key = json.dumps([stat.st_size, stat.st_mtime_ns, read_options], sort_keys=True, default=str)
+    return f"{_path_prefix(file_name)}_{hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]}"
+
+def load_cached_frame(cache_dir: str, file_name: str, read_options: dict):
+    """
+    读取源文件对应的缓存，以内存映射方式打开
+
+    返回:
+    - 命中时返回 DataFrame，未命中或缓存损坏时返回 None
+    """
+    stem = _entry_stem(file_name, read_options)
+    for file_format, suffix in _SUFFIXES.items():
+        entry_path = os.path.join(cache_dir, stem + suffix)
+        if not os.path.exists(entry_path):
+            continue
+        try:
+            if file_format == 'feather':
+                table = feather.read_table(entry_path, memory_map=True)
+            else:
+                table = pq.read_table(entry_path, memory_map=True)
+        except (OSError, pa.ArrowException):
+            remove_files(entry_path)
+            return None
+        touch(entry_path)
+        return table.to_pandas()
+    return None
+
+def store_cached_frame(cache_dir: str, file_name: str, read_options: dict, df: pd.DataFrame, file_format: str = 'feather') -> bool:
+    """
+    将解析后的 DataFrame 写入缓存，并删除该源文件已过期的旧条目
+
+    列名非字符串或列内类型混杂等无法按列式格式保存的数据会跳过缓存。
+
+    返回:
+    - 是否写入成功
+    """
+    if file_format not in _SUFFIXES:
+        raise ValueError(f"file_format 仅支持 {list(_SUFFIXES)}，当前为：{file_format}")
+
+    stem = _entry_stem(file_name, read_options)
+    entry_path = os.path.join(cache_dir, stem + _SUFFIXES[file_format])
+
+    def write(tmp_path):
+        table = pa.Table.from_pandas(df)
+        if file_format == 'feather':
+            feather.write_feather(table, tmp_path)
+        else:
+            pq.write_table(table, tmp_path)
+
+    if not write_columnar(entry_path, write, f"{file_name} 无法写入缓存"):
+        return False
+
+    for old_entry in glob.glob(os.path.join(cache_dir, f"{_path_prefix(file_name)}_*")):
+        if os.path.splitext(os.path.basename(old_entry))[0] != stem:
+            remove_files(old_entry)
+    return True
+
+def evict_frame_cache(cache_dir: str, max_bytes: int = DEFAULT_MAX_CACHE_BYTES):
+    """按最近使用时间淘汰缓存条目，直到缓存目录总大小不超过 max_bytes"""
+    entry_paths = [path for suffix in _SUFFIXES.values() for path in glob.glob(os.path.join(cache_dir, f"*{suffix}"))]
+    evict_lru(entry_paths, max_bytes)
+
+def clear_frame_cache(cache_dir: str, file_name: str = None) -> int:
+    """
+    清除缓存
+
+    参数:
+    - cache_dir: 缓存目录
+    - file_name: 只清除该源文件的缓存，默认清除全部
+
+    返回:
+    - 删除的缓存条目数量
+    """
+    pattern = f"{_path_prefix(file_name)}_*" if file_name else "*"
+    removed = 0
+    for suffix in _SUFFIXES.values():
+        for entry_path in glob.glob(os.path.join(cache_dir, pattern + suffix)):
+            remove_files(entry_path)
+            removed += 1
+    return removed
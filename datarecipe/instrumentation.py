@@ -0,0 +1,206 @@
+import json
+import time
+import logging
+import threading
+
+# 已注册的事件处理函数，替换而不是原地修改，发送事件时无需加锁
+_handlers = ()
+_handlers_lock = threading.Lock()
+
+# MetricsCollector 耗时直方图的分桶上限（秒）
+DEFAULT_DURATION_BUCKETS = (0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300)
+
+def add_handler(handler):
+    """
+    注册事件处理函数，之后各入口函数的每个阶段结束时都会以一个事件字典调用它
+
+    事件字典包含 'event'（如 'mysql.execute'、'sp_api.request'）、'time'（结束时间戳），
+    计时阶段另有 'duration'（秒），以及按阶段记录的 rows、bytes、status_code、retries 等字段；出错时带有 'error'。
+    未注册任何处理函数时不创建事件，几乎没有额外开销。以进程池并发的部分（如 local_to_df 的 executor_type='process'）在子进程中产生的事件不会上报。
+
+    返回:
+    - handler，便于作为装饰器使用
+    """
+    global _handlers
+    with _handlers_lock:
+        if handler not in _handlers:
+            _handlers = _handlers + (handler,)
+    return handler
+
+def remove_handler(handler):
+    """注销事件处理函数"""
+    global _handlers
+    with _handlers_lock:
+        _handlers = tuple(h for h in _handlers if h is not handler)
+
+def enabled() -> bool:
+    """是否注册了事件处理函数"""
+    return bool(_handlers)
+
+def emit(event: str, **fields):
+    """发送一个事件；处理函数抛出的异常只打印警告，不影响调用方"""
+    handlers = _handlers
+    if not handlers:
+        return
+    record = {'event': event, 'time': time.time(), **fields}
+    for handler in handlers:
+        try:
+            handler(record)
+        except Exception as e:
+            print(f"警告：事件处理函数出错：{e}")
+
+class _Span:
+    """计时阶段：退出时发送带 duration 的事件，期间可用 set() 补充字段"""
+    __slots__ = ('event', 'fields', 'start')
+
+    def __init__(self, event, fields):
+        self.event = event
+        self.fields = fields
+        self.start = None
+
+    def set(self, **fields):
+        self.fields.update(fields)
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.fields['duration'] = time.perf_counter() - self.start
+        # 生成器提前关闭（GeneratorExit）不算出错
+        if exc_type is not None and issubclass(exc_type, Exception):
+            self.fields['error'] = f"{exc_type.__name__}: {exc}"
+        emit(self.event, **self.fields)
+        return False
+
+class _NullSpan:
+    """未启用时使用的空阶段，不计时也不发送事件"""
+    __slots__ = ()
+
+    def set(self, **fields):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+def span(event: str, **fields):
+    """
+    计时一个阶段，用法:
+        with span('mysql.execute', table=table) as s:
+            ...
+            s.set(rows=len(df))
+    """
+    return _Span(event, fields) if _handlers else _NULL_SPAN
+
+class LoggingHandler:
+    """
+    把事件以 JSON 写入 logging
+
+    参数:
+    - logger: 记录器，默认为 logging.getLogger('datarecipe')
+    - level: 日志级别，出错的事件使用 WARNING
+    """
+
+    def __init__(self, logger=None, level=logging.INFO):
+        self.logger = logger or logging.getLogger('datarecipe')
+        self.level = level
+
+    def __call__(self, record):
+        level = logging.WARNING if 'error' in record else self.level
+        if self.logger.isEnabledFor(level):
+            self.logger.log(level, json.dumps(record, ensure_ascii=False, default=str))
+
+def _format_labels(labels) -> str:
+    """按 Prometheus 文本格式输出标签，转义反斜杠、双引号和换行"""
+    if not labels:
+        return ''
+    escaped = (
+        f'{key}="' + str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+        for key, value in labels
+    )
+    return '{' + ','.join(escaped) + '}'
+
+class MetricsCollector:
+    """
+    按事件汇总 Prometheus 风格的指标，render() 输出文本格式，可直接作为 /metrics 的响应：
+    - datarecipe_events_total{event, status}: 事件次数，status 为 ok 或 error
+    - datarecipe_event_duration_seconds{event}: 耗时直方图
+    - datarecipe_rows_total{event}、datarecipe_bytes_total{event}: 处理的行数和字节数
+    - datarecipe_retries_total{event, operation}: 重试次数
+    - datarecipe_http_responses_total{operation, status_code}: SP-API 响应状态码
+    """
+
+    def __init__(self, buckets=DEFAULT_DURATION_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counters = {}
+        self.histograms = {}
+        self.lock = threading.Lock()
+
+    def _inc(self, name, labels, value=1):
+        key = (name, tuple(sorted(labels.items())))
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def __call__(self, record):
+        event = record['event']
+        with self.lock:
+            self._inc('datarecipe_events_total', {'event': event, 'status': 'error' if 'error' in record else 'ok'})
+            for field, name in (('rows', 'datarecipe_rows_total'), ('bytes', 'datarecipe_bytes_total')):
+                if record.get(field):
+                    self._inc(name, {'event': event}, record[field])
+            operation = record.get('operation', '')
+            if record.get('retries'):
+                self._inc('datarecipe_retries_total', {'event': event, 'operation': operation}, record['retries'])
+            if record.get('status_code') is not None:
+                self._inc('datarecipe_http_responses_total', {'operation': operation, 'status_code': str(record['status_code'])})
+            if 'duration' in record:
+                histogram = self.histograms.setdefault(event, {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0})
+                for i, upper in enumerate(self.buckets):
+                    if record['duration'] <= upper:
+                        histogram['buckets'][i] += 1
+                histogram['sum'] += record['duration']
+                histogram['count'] += 1
+
+    def snapshot(self) -> dict:
+        """
+        返回指标的副本
+
+        返回:
+        - {'counters': {(指标名, ((标签, 值), ...)): 数值}, 'durations': {事件: {'sum': 秒, 'count': 次数}}}
+        """
+        with self.lock:
+            return {
+                'counters': dict(self.counters),
+                'durations': {event: {'sum': h['sum'], 'count': h['count']} for event, h in self.histograms.items()},
+            }
+
+    def reset(self):
+        """清空已汇总的指标"""
+        with self.lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def render(self) -> str:
+        """按 Prometheus 文本格式输出全部指标"""
+        lines = []
+        with self.lock:
+            names = sorted({name for name, _ in self.counters})
+            for name in names:
+                lines.append(f"# TYPE {name} counter")
+                for (metric, labels), value in sorted(self.counters.items()):
+                    if metric == name:
+                        lines.append(f"{name}{_format_labels(labels)} {value}")
+            if self.histograms:
+                name = 'datarecipe_event_duration_seconds'
+                lines.append(f"# TYPE {name} histogram")
+                for event, histogram in sorted(self.histograms.items()):
+                    for upper, count in zip(self.buckets, histogram['buckets']):
+                        lines.append(f"{name}_bucket{_format_labels((('event', event), ('le', str(upper))))} {count}")
+                    lines.append(f"{name}_bucket{_format_labels((('event', event), ('le', '+Inf')))} {histogram['count']}")
+                    lines.append(f"{name}_sum{_format_labels((('event', event),))} {histogram['sum']}")
+                    lines.append(f"{name}_count{_format_labels((('event', event),))} {histogram['count']}")
+        return '\n'.join(lines) + '\n'
@@ -1,22 +1,70 @@
 import os
+import tempfile
+import threading
+import time
+import uuid
+import concurrent.futures
 import yaml
 import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 from datetime import datetime
-from typing import Optional
+from typing import Iterator, Optional
 from sqlalchemy import create_engine, text
 from sqlalchemy.engine import URL
-from sqlalchemy.exc import ResourceClosedError
+from sqlalchemy.exc import ResourceClosedError, DBAPIError
+from .instrumentation import span, emit
+from .query_cache import (
+    DEFAULT_MAX_CACHE_BYTES as DEFAULT_QUERY_CACHE_BYTES,
+    query_cache_key,
+    referenced_tables,
+    load_cached_result,
+    store_result
+)
+from .disk_cache import atomic_write
+
+WRITE_METHODS = ('to_sql', 'load_data', 'multi_insert')
+UPDATE_MODES = ('replace', 'upsert', 'staging', 'swap', 'diff')
+
+# 连接池参数，可通过 configure_pool 修改，对之后新建的 engine 生效
+POOL_SETTINGS = {
+    'pool_size': 5,
+    'max_overflow': 10,
+    'pool_pre_ping': True,
+    'pool_recycle': 3600,
+}
+
+_config_cache = {}  # 配置文件绝对路径 -> (修改时间, 解析后的配置)
+_engines = {}  # (配置文件绝对路径, database, local_infile) -> (数据库配置, engine)
+_registry_lock = threading.Lock()
+
+def _config_path(yaml_file_name: str, custom_path: Optional[str] = None) -> str:
+    return os.path.abspath(os.path.join(custom_path, yaml_file_name) if custom_path else yaml_file_name)
 
 def load_db_config(yaml_file_name: str, database: str, custom_path: Optional[str] = None) -> dict:
-    """加载数据库配置"""
-    file_path = os.path.join(custom_path, yaml_file_name) if custom_path else yaml_file_name
-    with open(file_path, 'r') as stream:
-        config = yaml.safe_load(stream)
-    return config.get(database, {})
-
-def connect_to_db(cfg: dict):
-    """创建数据库连接"""
+    """加载数据库配置，按文件修改时间缓存解析结果"""
+    file_path = _config_path(yaml_file_name, custom_path)
+    mtime = os.stat(file_path).st_mtime_ns
+    with _registry_lock:
+        cached = _config_cache.get(file_path)
+    if cached and cached[0] == mtime:
+        config = cached[1]
+    else:
+        with open(file_path, 'r') as stream:
+            config = yaml.safe_load(stream) or {}
+        with _registry_lock:
+            _config_cache[file_path] = (mtime, config)
+    return dict(config.get(database, {}))
+
+def _install_mysqldb():
+    """mysql+mysqldb 方言使用 PyMySQL 作为驱动；在创建 engine 前调用，导入 datarecipe 时不加载 PyMySQL"""
+    import pymysql
+    pymysql.install_as_MySQLdb()
+
+def connect_to_db(cfg: dict, local_infile: bool = False, **pool_settings):
+    """创建数据库连接，local_infile 为True时允许 LOAD DATA LOCAL INFILE，pool_settings 传给 create_engine"""
+    _install_mysqldb()
     try:
         url = URL.create(
             drivername='mysql+mysqldb',
@@ -26,29 +74,446 @@ def connect_to_db(cfg: dict):
             port=cfg['port'],
             database=cfg['database']
         )
-        engine = create_engine(url)
+        connect_args = {'local_infile': 1} if local_infile else {}
+        engine = create_engine(url, connect_args=connect_args, **pool_settings)
         return engine
     except KeyError as e:
         raise ValueError(f"配置中缺少必要的键：{e}")
 
+def get_engine(database: str, yaml_file_name: str = 'cfg.yaml', custom_path: Optional[str] = None, local_infile: bool = False):
+    """
+    获取进程内共享的 engine，每个 (配置文件, database) 只创建一次连接池
+
+    配置文件中该数据库的配置变化后会自动重建 engine。
+    """
+    cfg = load_db_config(yaml_file_name, database, custom_path)
+    key = (_config_path(yaml_file_name, custom_path), database, local_infile)
+    with _registry_lock:
+        cached = _engines.get(key)
+        if cached and cached[0] == cfg:
+            return cached[1]
+        engine = connect_to_db(cfg, local_infile, **POOL_SETTINGS)
+        _engines[key] = (cfg, engine)
+    if cached:
+        cached[1].dispose()
+    return engine
+
+def configure_pool(**settings):
+    """
+    修改连接池参数，如 pool_size、max_overflow、pool_pre_ping、pool_recycle
+
+    已创建的 engine 不受影响，需要立即生效时先调用 dispose_all。
+    """
+    POOL_SETTINGS.update(settings)
+
+def dispose_all():
+    """关闭所有共享 engine 的连接池，用于程序退出前释放连接"""
+    with _registry_lock:
+        engines = [engine for _, engine in _engines.values()]
+        _engines.clear()
+    for engine in engines:
+        engine.dispose()
+
+def _reset_after_fork():
+    """子进程不能复用父进程的连接，丢弃继承的连接池但不关闭父进程的连接"""
+    global _registry_lock
+    _registry_lock = threading.Lock()
+    for _, engine in _engines.values():
+        engine.dispose(close=False)
+    _engines.clear()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+def _inf_positions(series: pd.Series) -> Optional[np.ndarray]:
+    """返回浮点列中无穷值的行位置，不含无穷值时返回 None；列和为有限值时无需再生成掩码"""
+    if isinstance(series.dtype, np.dtype):
+        values = series.to_numpy()
+    else:
+        values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+    with np.errstate(over='ignore', invalid='ignore'):
+        if np.isfinite(values.sum()):
+            return None
+    positions = np.flatnonzero(np.isinf(values))
+    return positions if len(positions) else None
+
 def clean_dataframe(df: pd.DataFrame):
-    """清理DataFrame中的无穷值"""
-    numeric_cols = df.select_dtypes(include=[np.number]).columns
-    if len(numeric_cols) > 0:
-        inf_values = df[numeric_cols].isin([np.inf, -np.inf]).any()
-        cols_with_inf = inf_values[inf_values].index.tolist()
-        if cols_with_inf:
-            df.replace([np.inf, -np.inf], np.nan, inplace=True)
-            print(f"警告：以下列包含无穷值，已替换为NaN：{cols_with_inf}")
-
-def execute_sql(engine, sql_statement: str):
-    """执行SQL语句"""
+    """原地清理DataFrame中的无穷值：逐个浮点列检查，只改写含无穷值的列"""
+    cols_with_inf = []
+    for i, dtype in enumerate(df.dtypes):
+        if not pd.api.types.is_float_dtype(dtype):
+            continue
+        positions = _inf_positions(df.iloc[:, i])
+        if positions is not None:
+            df.iloc[positions, i] = np.nan
+            cols_with_inf.append(df.columns[i])
+    if cols_with_inf:
+        print(f"警告：以下列包含无穷值，已替换为NaN：{cols_with_inf}")
+
+def execute_sql(engine, sql_statement: str, params=None):
+    """执行SQL语句；传入 params 时交给驱动填充 %s 或 %(name)s 占位，与 pd.read_sql 相同"""
     try:
-        with engine.begin() as conn:
-            conn.execute(text(sql_statement))
+        with span('mysql.execute', statement=(sql_statement.split(None, 1) or [''])[0].upper()), engine.begin() as conn:
+            if params is None:
+                conn.execute(text(sql_statement))
+            else:
+                conn.exec_driver_sql(sql_statement, params)
     except Exception as e:
         raise ValueError(f"执行SQL时发生错误：{e}")
 
+def _quote_identifier(name: str) -> str:
+    """为表名/列名加反引号"""
+    return '`' + str(name).replace('`', '``') + '`'
+
+def _load_data_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """转换为 LOAD DATA 可直接读取的格式：布尔值转为0/1，字符串中的反斜杠转义"""
+    df = df.copy()
+    for col in df.columns:
+        if pd.api.types.is_bool_dtype(df[col]):
+            df[col] = df[col].astype(int)
+        elif pd.api.types.is_object_dtype(df[col]) or pd.api.types.is_string_dtype(df[col]):
+            df[col] = df[col].map(lambda value: value.replace('\\', '\\\\') if isinstance(value, str) else value)
+    return df
+
+def load_data_infile(engine, df: pd.DataFrame, table: str, batch_size: int = 100000):
+    """
+    通过 LOAD DATA LOCAL INFILE 批量导入：分块写入临时CSV文件后一次性加载
+
+    需要服务端开启 local_infile，且 engine 由 get_engine(..., local_infile=True) 创建。
+    """
+    with engine.begin() as conn:
+        _load_data(conn, df, table, batch_size)
+
+def _load_data(conn, df: pd.DataFrame, table: str, batch_size: int = 100000):
+    """在指定连接上执行 LOAD DATA LOCAL INFILE，供需要与其他语句同处一个事务的调用方使用"""
+    fd, tmp_path = tempfile.mkstemp(suffix='.csv')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8', newline='') as f:
+            for start in range(0, len(df), batch_size):
+                chunk = _load_data_frame(df.iloc[start:start + batch_size])
+                chunk.to_csv(f, index=False, header=False, na_rep='\\N', lineterminator='\n')
+
+        columns = ', '.join(_quote_identifier(col) for col in df.columns)
+        load_sql = (
+            f"LOAD DATA LOCAL INFILE '{tmp_path.replace(os.sep, '/')}' INTO TABLE {_quote_identifier(table)} "
+            f"CHARACTER SET utf8mb4 FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' ESCAPED BY '\\\\' "
+            f"LINES TERMINATED BY '\\n' ({columns})"
+        )
+        conn.exec_driver_sql(load_sql)
+    finally:
+        os.remove(tmp_path)
+
+def insert_multi_rows(engine, df: pd.DataFrame, table: str, batch_size: int = 10000):
+    """按 batch_size 行一批，以多行 INSERT 语句写入"""
+    df.to_sql(table, engine, if_exists='append', index=False, chunksize=batch_size, method=_executemany_insert)
+
+def _executemany_insert(pd_table, conn, keys, data_iter):
+    """pandas to_sql 的写入方法：交给驱动的 executemany，由驱动合并为多行 INSERT"""
+    columns = ', '.join(_quote_identifier(key) for key in keys)
+    placeholders = ', '.join(['%s'] * len(keys))
+    insert_sql = f"INSERT INTO {_quote_identifier(pd_table.name)} ({columns}) VALUES ({placeholders})"
+    conn.exec_driver_sql(insert_sql, list(data_iter))
+
+def write_df(engine, df: pd.DataFrame, table: str, write_method: str = 'to_sql', batch_size: int = 10000):
+    """
+    按指定方式写入数据
+
+    参数:
+    - write_method: 'to_sql'（pandas 默认写入）、'load_data'（LOAD DATA LOCAL INFILE，不可用时自动改用多行INSERT）或 'multi_insert'（多行INSERT）
+    - batch_size: 每批写入的行数
+    """
+    with span('mysql.write', table=table, method=write_method, rows=len(df)) as s:
+        if write_method == 'load_data':
+            try:
+                load_data_infile(engine, df, table)
+                return
+            except DBAPIError as e:
+                print(f"LOAD DATA LOCAL INFILE 不可用，改用多行INSERT写入：{e.orig}")
+            write_method = 'multi_insert'
+            s.set(method=write_method, fallback=True)
+
+        if write_method == 'multi_insert':
+            insert_multi_rows(engine, df, table, batch_size)
+        else:
+            df.to_sql(table, engine, if_exists='append', index=False)
+
+def _sql_rows(df: pd.DataFrame) -> list:
+    """转换为驱动可直接写入的元组列表，缺失值转为 None"""
+    values = df.astype(object).where(df.notna(), None)
+    return list(values.itertuples(index=False, name=None))
+
+def _insert_rows(conn, table: str, df: pd.DataFrame, batch_size: int = 10000, upsert: bool = False):
+    """在指定连接上按批写入，upsert 为True时使用 INSERT ... ON DUPLICATE KEY UPDATE"""
+    columns = ', '.join(_quote_identifier(col) for col in df.columns)
+    placeholders = ', '.join(['%s'] * len(df.columns))
+    insert_sql = f"INSERT INTO {_quote_identifier(table)} ({columns}) VALUES ({placeholders})"
+    if upsert:
+        insert_sql += " ON DUPLICATE KEY UPDATE " + _update_assignments(df.columns)
+    for start in range(0, len(df), batch_size):
+        conn.exec_driver_sql(insert_sql, _sql_rows(df.iloc[start:start + batch_size]))
+
+def _update_assignments(columns) -> str:
+    return ', '.join(f"{_quote_identifier(col)} = VALUES({_quote_identifier(col)})" for col in columns)
+
+def _date_range_clause(df: pd.DataFrame, clause: Optional[str], date_col: Optional[str]) -> Optional[str]:
+    """如果指定了日期列，在 clause 上追加数据的日期范围条件"""
+    if date_col and date_col in df.columns:
+        min_date = df[date_col].min()
+        max_date = df[date_col].max()
+        print(f"更新的数据日期范围：{min_date} ~ {max_date}")
+        if clause:
+            clause = f"{clause} AND {date_col} >= '{min_date}' AND {date_col} <= '{max_date}'"
+        else:
+            clause = f"{date_col} >= '{min_date}' AND {date_col} <= '{max_date}'"
+    return clause
+
+def upsert_df(engine, df: pd.DataFrame, table: str, batch_size: int = 10000):
+    """按批执行 INSERT ... ON DUPLICATE KEY UPDATE，需要目标表有主键或唯一索引"""
+    with span('mysql.upsert', table=table, rows=len(df)), engine.begin() as conn:
+        _insert_rows(conn, table, df, batch_size, upsert=True)
+
+def merge_via_staging(engine, df: pd.DataFrame, table: str, clause: Optional[str] = None, write_method: str = 'to_sql', batch_size: int = 10000):
+    """
+    先用 write_df（可选 LOAD DATA / 多行INSERT）把数据写入暂存表，再在同一个事务中合并到目标表
+
+    有 clause 时删除目标表中符合条件的数据后整体插入，否则按主键/唯一索引 upsert。
+    暂存表不带索引和分区，写入时不会锁目标表；表名带随机后缀，并发调用互不影响，结束后删除。
+    """
+    staging_name = f"_stg_{uuid.uuid4().hex[:8]}_{table}"[:64]
+    staging = _quote_identifier(staging_name)
+    columns = ', '.join(_quote_identifier(col) for col in df.columns)
+    execute_sql(engine, f"CREATE TABLE {staging} AS SELECT {columns} FROM {_quote_identifier(table)} LIMIT 0")
+    try:
+        write_df(engine, df, staging_name, write_method, batch_size)
+        with engine.begin() as conn:
+            if clause:
+                conn.exec_driver_sql(f"DELETE FROM {_quote_identifier(table)} WHERE {clause}")
+                conn.exec_driver_sql(f"INSERT INTO {_quote_identifier(table)} ({columns}) SELECT {columns} FROM {staging}")
+            else:
+                conn.exec_driver_sql(
+                    f"INSERT INTO {_quote_identifier(table)} ({columns}) SELECT {columns} FROM {staging} "
+                    f"ON DUPLICATE KEY UPDATE {_update_assignments(df.columns)}"
+                )
+    finally:
+        execute_sql(engine, f"DROP TABLE IF EXISTS {staging}")
+
+def swap_table(engine, df: pd.DataFrame, table: str, write_method: str = 'to_sql', batch_size: int = 10000):
+    """
+    整表替换：写入与目标表结构相同（含索引、分区）的新表，再用一条 RENAME TABLE 原子切换
+    """
+    new_table, old_table = f"{table}__new", f"{table}__old"
+    execute_sql(engine, f"DROP TABLE IF EXISTS {_quote_identifier(new_table)}")
+    execute_sql(engine, f"CREATE TABLE {_quote_identifier(new_table)} LIKE {_quote_identifier(table)}")
+    try:
+        write_df(engine, df, new_table, write_method, batch_size)
+    except Exception:
+        execute_sql(engine, f"DROP TABLE IF EXISTS {_quote_identifier(new_table)}")
+        raise
+    execute_sql(engine, f"DROP TABLE IF EXISTS {_quote_identifier(old_table)}")
+    execute_sql(
+        engine,
+        f"RENAME TABLE {_quote_identifier(table)} TO {_quote_identifier(old_table)}, "
+        f"{_quote_identifier(new_table)} TO {_quote_identifier(table)}"
+    )
+    execute_sql(engine, f"DROP TABLE {_quote_identifier(old_table)}")
+
+_DATETIME_KINDS = ('datetime64', 'datetime', 'date')
+
+def _comparison_kind(new: pd.Series, old: pd.Series) -> str:
+    """
+    根据两侧的实际类型决定列的比较方式：
+    - 'datetime': 任一侧是日期/时间（如 DATETIME 列读出的 datetime64 与数据中的 '2024-01-01' 字符串），两侧都解析为 datetime64
+    - 'integer': 两侧都是整数，保持 Int64 精确比较（BIGINT 超过 2**53 时转 float64 会冲突）
+    - 'float': 数值或布尔，统一为 float64（DECIMAL 读出的 Decimal 对象也在此列）
+    - 'string': 其余转为字符串
+    """
+    kinds = [pd.api.types.infer_dtype(values, skipna=True) for values in (new, old)]
+    if any(kind in _DATETIME_KINDS for kind in kinds):
+        return 'datetime'
+    if pd.api.types.is_bool_dtype(new.dtype) or pd.api.types.is_numeric_dtype(new.dtype):
+        return 'integer' if all(kind in ('integer', 'empty') for kind in kinds) else 'float'
+    return 'string'
+
+def _normalize_column(values: pd.Series, kind: str) -> pd.Series:
+    """把一列转换为 _comparison_kind 决定的可比较类型"""
+    if kind == 'datetime':
+        if pd.api.types.is_datetime64_any_dtype(values.dtype):
+            return values
+        # 同一列中可能混有 '2024-01-01' 和 '2024-01-01 00:00:00'，逐个推断格式
+        return pd.to_datetime(values, errors='coerce', format='mixed')
+    if kind == 'integer':
+        return pd.to_numeric(values, errors='coerce').astype('Int64')
+    if kind == 'float':
+        return pd.to_numeric(values, errors='coerce').astype('float64')
+    return values.map(lambda value: None if pd.isna(value) else str(value))
+
+def _diff_rows(df: pd.DataFrame, existing: pd.DataFrame, key_cols: list):
+    """
+    按 key_cols 的原始取值关联新数据与库中已有数据，对比非主键列的逐行哈希
+
+    返回:
+    - 元组 (需要写入的 df 行位置, 需要删除的 existing 行位置, 统计字典)
+    """
+    new_norm, old_norm = {}, {}
+    for col in df.columns:
+        kind = _comparison_kind(df[col], existing[col])
+        new_norm[col] = _normalize_column(df[col], kind).reset_index(drop=True)
+        old_norm[col] = _normalize_column(existing[col], kind).reset_index(drop=True)
+    new_norm, old_norm = pd.DataFrame(new_norm), pd.DataFrame(old_norm)
+
+    # 主键列只参与关联，不参与哈希；没有非主键列时主键相同即视为未变化
+    value_cols = [col for col in df.columns if col not in key_cols]
+
+    def row_hashes(norm):
+        if not value_cols:
+            return np.zeros(len(norm), dtype=np.uint64)
+        return pd.util.hash_pandas_object(norm[value_cols], index=False).to_numpy()
+
+    new_keys = new_norm[key_cols].assign(_hash=row_hashes(new_norm), _pos=np.arange(len(df)))
+    old_keys = old_norm[key_cols].assign(_hash=row_hashes(old_norm), _pos=np.arange(len(existing)))
+
+    merged = new_keys.merge(old_keys, on=key_cols, how='outer', suffixes=('_new', '_old'), indicator=True)
+    inserted = (merged['_merge'] == 'left_only').to_numpy()
+    deleted = (merged['_merge'] == 'right_only').to_numpy()
+    changed = ((merged['_merge'] == 'both') & (merged['_hash_new'] != merged['_hash_old'])).to_numpy()
+
+    write_positions = merged.loc[inserted | changed, '_pos_new'].astype(int).to_numpy()
+    delete_positions = merged.loc[deleted | changed, '_pos_old'].astype(int).to_numpy()
+    stats = {
+        'inserted': int(inserted.sum()),
+        'changed': int(changed.sum()),
+        'deleted': int(deleted.sum()),
+        'unchanged': int(len(merged) - inserted.sum() - changed.sum() - deleted.sum()),
+    }
+    return np.sort(write_positions), np.sort(delete_positions), stats
+
+def _delete_keys(conn, table: str, keys: pd.DataFrame, batch_size: int = 10000):
+    """按主键值分批删除：WHERE (k1, k2) IN ((...), (...))"""
+    key_cols = list(keys.columns)
+    if len(key_cols) == 1:
+        target, placeholder = _quote_identifier(key_cols[0]), '%s'
+    else:
+        target = '(' + ', '.join(_quote_identifier(col) for col in key_cols) + ')'
+        placeholder = '(' + ', '.join(['%s'] * len(key_cols)) + ')'
+    rows = _sql_rows(keys)
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        delete_sql = f"DELETE FROM {_quote_identifier(table)} WHERE {target} IN ({', '.join([placeholder] * len(batch))})"
+        conn.exec_driver_sql(delete_sql, tuple(value for row in batch for value in row))
+
+def diff_load(engine, df: pd.DataFrame, table: str, key_cols: list, clause: Optional[str] = None, batch_size: int = 10000) -> dict:
+    """
+    增量写入：读取 clause 范围内的已有数据，按 key_cols 对比逐行哈希，只写入新增、变化和删除的行
+
+    clause 为空时对比整张表，表中不在 df 里的行会被删除。
+
+    返回:
+    - 统计字典 {'inserted', 'changed', 'deleted', 'unchanged', 'written', 'skipped'}
+    """
+    missing = [col for col in key_cols if col not in df.columns]
+    if missing:
+        raise ValueError(f"key_cols 不在数据列中：{missing}")
+    if df.duplicated(subset=key_cols).any():
+        raise ValueError(f"数据中 {key_cols} 存在重复值，无法按主键对比")
+
+    columns = ', '.join(_quote_identifier(col) for col in df.columns)
+    select_sql = f"SELECT {columns} FROM {_quote_identifier(table)}" + (f" WHERE {clause}" if clause else "")
+    with engine.begin() as conn:
+        existing = pd.read_sql(select_sql, conn)
+        write_positions, delete_positions, stats = _diff_rows(df, existing, key_cols)
+        _delete_keys(conn, table, existing.iloc[delete_positions][key_cols], batch_size)
+        _insert_rows(conn, table, df.iloc[write_positions], batch_size)
+
+    stats['written'] = stats['inserted'] + stats['changed'] + stats['deleted']
+    stats['skipped'] = stats['unchanged']
+    print(f"新增 {stats['inserted']} 行，变化 {stats['changed']} 行，删除 {stats['deleted']} 行，未变化跳过 {stats['unchanged']} 行")
+    return stats
+
+def _write_partition(
+        engine,
+        df: pd.DataFrame,
+        table: str,
+        label,
+        delete_clause: Optional[str] = None,
+        delete_params: tuple = (),
+        batch_size: int = 10000,
+        write_method: str = 'to_sql'
+    ) -> dict:
+    """在单独的事务中写入一个分区：先删除该分区的旧数据（如有），再插入"""
+    start_time = time.perf_counter()
+    with span('mysql.write_partition', table=table, partition=str(label), rows=len(df), method=write_method) as s, engine.begin() as conn:
+        if delete_clause:
+            with span('mysql.execute', statement='DELETE', table=table, partition=str(label)):
+                conn.exec_driver_sql(f"DELETE FROM {_quote_identifier(table)} WHERE {delete_clause}", delete_params)
+        if write_method == 'load_data':
+            # LOAD DATA 失败时只回滚到保存点，删除仍在同一事务中，改用多行INSERT写入
+            try:
+                with conn.begin_nested():
+                    _load_data(conn, df, table)
+            except DBAPIError as e:
+                print(f"LOAD DATA LOCAL INFILE 不可用，分区 {label} 改用多行INSERT写入：{e.orig}")
+                s.set(method='multi_insert', fallback=True)
+                _insert_rows(conn, table, df, batch_size)
+        else:
+            _insert_rows(conn, table, df, batch_size)
+    elapsed = time.perf_counter() - start_time
+    return {
+        'partition': label,
+        'rows': len(df),
+        'seconds': elapsed,
+        'rows_per_second': len(df) / elapsed if elapsed > 0 else float('inf'),
+    }
+
+def parallel_write(
+        engine,
+        df: pd.DataFrame,
+        table: str,
+        partition_col: Optional[str] = None,
+        clause: Optional[str] = None,
+        max_workers: int = 4,
+        batch_size: int = 10000,
+        write_method: str = 'to_sql'
+    ) -> list:
+    """
+    把数据拆分为多个分区，通过连接池中的多个连接并发写入，每个分区一个事务
+
+    参数:
+    - partition_col: 按该列的取值拆分，每个分区先删除该取值（并满足 clause）的旧数据再插入；为空时按行数均分且只插入。
+      该列为空值的行单独作为一个分区，删除条件为 IS NULL
+    - clause: 按列拆分时附加到每个分区删除条件上的条件
+    - max_workers: 并发写入的连接数
+    - write_method: 'load_data' 时每个分区在自己的事务中用 LOAD DATA LOCAL INFILE 写入（不可用时改用多行INSERT），其余方式均为多行INSERT
+
+    返回:
+    - 每个分区的统计列表 [{'partition', 'rows', 'seconds', 'rows_per_second'}]
+    """
+    tasks = []
+    if partition_col:
+        column = _quote_identifier(partition_col)
+        # 原始条件中的 % 需要转义，避免被当作参数占位符
+        prefix = f"({clause.replace('%', '%%')}) AND " if clause else ""
+        for value, part in df.groupby(partition_col, sort=True, dropna=False):
+            if pd.isna(value):
+                tasks.append((part, value, f"{prefix}{column} IS NULL", ()))
+            else:
+                tasks.append((part, value, f"{prefix}{column} = %s", (value,)))
+    else:
+        n_partitions = min(max_workers, len(df))
+        for positions in np.array_split(np.arange(len(df)), n_partitions):
+            tasks.append((df.iloc[positions], f"rows {positions[0]}-{positions[-1]}", None, ()))
+
+    results = []
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(_write_partition, engine, part, table, label, delete_clause, params, batch_size, write_method)
+            for part, label, delete_clause, params in tasks
+        ]
+        for future in concurrent.futures.as_completed(futures):
+            result = future.result()
+            results.append(result)
+            print(f"分区 {result['partition']}：{result['rows']} 行，{result['seconds']:.2f} 秒，{result['rows_per_second']:.0f} 行/秒")
+    return results
+
 def update(
         raw_df: pd.DataFrame,
         database: str,
@@ -56,51 +521,89 @@ def update(
         yaml_file_name: str = 'cfg.yaml',
         clause: Optional[str] = None,
         date_col: Optional[str] = None,
-        custom_path: Optional[str] = None
+        custom_path: Optional[str] = None,
+        write_method: str = 'to_sql',
+        batch_size: int = 10000,
+        mode: str = 'replace',
+        key_cols: Optional[list] = None,
+        max_workers: Optional[int] = None,
+        copy: bool = True
     ):
-    try:
-        df = raw_df.copy()
-        if df.empty:
-            raise ValueError("导入的数据集为空。")
-        
-        # 清理数据
-        clean_dataframe(df)
-        
-        # 加载数据库配置
-        cfg = load_db_config(yaml_file_name, database, custom_path)
-        
-        # 连接数据库
-        engine = connect_to_db(cfg)
-        
-        # 测试写入一行数据
-        test_df = df.iloc[[0]].copy()
+    """
+    写入数据，mode 决定写入方式:
+    - 'replace': 先删除 clause/date_col 范围内的旧数据再追加，write_method 见 write_df
+    - 'upsert': 按主键/唯一索引 INSERT ... ON DUPLICATE KEY UPDATE，不删除数据
+    - 'staging': 先按 write_method 写入暂存表，再在一个事务中删除范围内旧数据并插入（无范围条件时 upsert）
+    - 'swap': 整表替换，写入新表后原子 RENAME；表中原有的数据全部被替换，不能与 clause/date_col 同时使用
+    - 'diff': 按 key_cols 对比 clause/date_col 范围内的已有数据，只写入新增、变化和删除的行，返回统计字典
+
+    replace 模式下指定 max_workers 时并发写入：有 date_col 时按日期拆分（日期为空的行单独一个分区），每个日期一个事务（删除该日期的旧数据后插入），
+    否则先删除 clause 范围内的数据再按行数拆分并发插入；返回每个分区的统计列表。
+
+    copy=False 时不复制 raw_df，无穷值直接在 raw_df 上替换为 NaN，峰值内存约为一份数据。
+    """
+    with span('mysql.update', database=database, table=table, mode=mode, rows=len(raw_df)):
         try:
-            test_df.to_sql(table, engine, if_exists='append', index=False)
-        except Exception as e:
-            raise ValueError(f"测试写入数据失败，请检查数据格式：{str(e)}")
-        
-        # 如果指定了日期列，添加日期条件
-        if date_col and date_col in df.columns:
-            min_date = df[date_col].min()
-            max_date = df[date_col].max()
-            print(f"更新的数据日期范围：{min_date} ~ {max_date}")
-            if clause:
-                clause = f"{clause} AND {date_col} >= '{min_date}' AND {date_col} <= '{max_date}'"
-            else:
-                clause = f"{date_col} >= '{min_date}' AND {date_col} <= '{max_date}'"
+            if write_method not in WRITE_METHODS:
+                raise ValueError(f"write_method 仅支持 {list(WRITE_METHODS)}，当前为：{write_method}")
+            if mode not in UPDATE_MODES:
+                raise ValueError(f"mode 仅支持 {list(UPDATE_MODES)}，当前为：{mode}")
+            if mode == 'swap' and (clause or date_col):
+                raise ValueError("mode='swap' 会替换整张表，不能指定 clause 或 date_col；只替换部分数据请使用 'replace' 或 'staging'")
+            df = raw_df.copy() if copy else raw_df
+            if df.empty:
+                raise ValueError("导入的数据集为空。")
         
-        # 如果有条件子句，先删除符合条件的数据
-        if clause:
-            delete_sql = f"DELETE FROM {table} WHERE {clause}"
-            execute_sql(engine, delete_sql)
+            # 清理数据
+            clean_dataframe(df)
         
-        # 将数据写入数据库
-        df.to_sql(table, engine, if_exists='append', index=False)
+            # 获取共享的数据库连接
+            engine = get_engine(database, yaml_file_name, custom_path, local_infile=write_method == 'load_data')
+
+            if mode == 'upsert':
+                upsert_df(engine, df, table, batch_size)
+            elif mode == 'staging':
+                merge_via_staging(engine, df, table, _date_range_clause(df, clause, date_col), write_method, batch_size)
+            elif mode == 'swap':
+                swap_table(engine, df, table, write_method, batch_size)
+            elif mode == 'diff':
+                if not key_cols:
+                    raise ValueError("mode='diff' 需要指定 key_cols")
+                key_cols = key_cols if isinstance(key_cols, list) else [key_cols]
+                stats = diff_load(engine, df, table, key_cols, _date_range_clause(df, clause, date_col), batch_size)
+                print(f"成功更新 {database}.{table}：写入 {stats['written']} 行，跳过 {stats['skipped']} 行")
+                return stats
+            else:
+                # 测试写入一行数据
+                test_df = df.iloc[[0]].copy()
+                try:
+                    test_df.to_sql(table, engine, if_exists='append', index=False)
+                except Exception as e:
+                    raise ValueError(f"测试写入数据失败，请检查数据格式：{str(e)}")
+
+                # 按日期并发写入时，每个分区自行删除该日期的旧数据
+                if max_workers and date_col and date_col in df.columns:
+                    results = parallel_write(engine, df, table, date_col, clause, max_workers, batch_size, write_method)
+                    print(f"成功更新 {len(df)} 条记录到 {database}.{table}")
+                    return results
+
+                # 如果有条件子句，先删除符合条件的数据
+                clause = _date_range_clause(df, clause, date_col)
+                if clause:
+                    delete_sql = f"DELETE FROM {table} WHERE {clause}"
+                    execute_sql(engine, delete_sql)
+
+                # 将数据写入数据库
+                if max_workers:
+                    results = parallel_write(engine, df, table, max_workers=max_workers, batch_size=batch_size, write_method=write_method)
+                    print(f"成功更新 {len(df)} 条记录到 {database}.{table}")
+                    return results
+                write_df(engine, df, table, write_method, batch_size)
         
-        print(f"成功更新 {len(df)} 条记录到 {database}.{table}")
+            print(f"成功更新 {len(df)} 条记录到 {database}.{table}")
         
-    except Exception as e:
-        raise Exception(f"更新数据时发生错误：{str(e)}")
+        except Exception as e:
+            raise Exception(f"更新数据时发生错误：{str(e)}")
 
 
 def print_action_result(table: str, action: str, df: pd.DataFrame, df_date_col: Optional[str] = None):
@@ -112,23 +615,189 @@ def print_action_result(table: str, action: str, df: pd.DataFrame, df_date_col:
     else:
         print(f"{table} 数据已{action}：{current_time}")
 
+def _table_versions(engine, tables: list) -> Optional[dict]:
+    """
+    查询表在 information_schema 中的 UPDATE_TIME，作为缓存的表版本
+
+    参数:
+    - tables: referenced_tables 识别出的 [(库名或None, 表名)]
+
+    返回:
+    - {库名.表名: 更新时间}；没有表、有表查不到（如临时表）或 UPDATE_TIME 为空（如实例重启后尚未写入的 InnoDB 表）时
+      返回 None，缓存只按有效期判断
+    """
+    if not tables:
+        return None
+    conditions = []
+    params = []
+    for schema, table in tables:
+        conditions.append("(TABLE_SCHEMA = %s AND TABLE_NAME = %s)" if schema else "(TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s)")
+        params.extend([schema, table] if schema else [table])
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql(
+            f"SELECT TABLE_SCHEMA, TABLE_NAME, UPDATE_TIME FROM information_schema.TABLES WHERE {' OR '.join(conditions)}",
+            tuple(params)
+        ).fetchall()
+    if len(rows) < len(tables) or any(update_time is None for _, _, update_time in rows):
+        return None
+    return {f"{schema}.{table}": str(update_time) for schema, table, update_time in rows}
+
 def sql_query(
         database: str,
         sql: str,
         yaml_file_name: str='cfg.yaml',
-        custom_path: Optional[str] = None
+        custom_path: Optional[str] = None,
+        params=None,
+        cache_dir: Optional[str] = None,
+        cache_ttl: float = 3600,
+        cache_check_tables: bool = True,
+        cache_max_bytes: int = DEFAULT_QUERY_CACHE_BYTES
     ) -> Optional[pd.DataFrame]:
-    """执行SQL查询"""
-    cfg = load_db_config(yaml_file_name, database, custom_path)
-    engine = connect_to_db(cfg)
+    """
+    执行SQL查询
+
+    参数:
+    - params: 传给驱动的查询参数，SQL中使用 %s 或 %(name)s 占位；非 SELECT 语句同样使用
+    - cache_dir: SELECT结果的磁盘缓存目录，默认不缓存；缓存键由 (数据库, 规范化的SQL, 参数) 生成，结果以 Parquet 保存
+    - cache_ttl: 缓存有效期（秒）
+    - cache_check_tables: 命中前比对所查询表在 information_schema 中的 UPDATE_TIME，表有写入则缓存失效；
+        无法可靠识别所查询的表时不使用缓存
+    - cache_max_bytes: 缓存目录的容量上限，超出后按最近使用时间淘汰
+    """
+    engine = get_engine(database, yaml_file_name, custom_path)
     try:
         if sql.strip().upper().startswith("SELECT"):
-            df = pd.read_sql(sql, engine)
-            return df
+            with span('mysql.query', database=database) as s:
+                tables = referenced_tables(sql) if cache_dir is not None and cache_check_tables else []
+                if cache_dir is None or tables is None:
+                    # 无法判断缓存是否过期时直接查询
+                    df = pd.read_sql(sql, engine, params=params)
+                    s.set(rows=len(df))
+                    return df
+
+                cache_key = query_cache_key(database, sql, params)
+                versions = _table_versions(engine, tables) if cache_check_tables else None
+                df = load_cached_result(cache_dir, cache_key, cache_ttl, versions)
+                s.set(cache='hit' if df is not None else 'miss')
+                if df is None:
+                    df = pd.read_sql(sql, engine, params=params)
+                    store_result(cache_dir, cache_key, df, sql, versions, cache_max_bytes, cache_ttl)
+                s.set(rows=len(df))
+                return df
         else:
-            execute_sql(engine, sql)
+            execute_sql(engine, sql, params)
             print('操作完成。')
     except ResourceClosedError:
         print('查询完成，但没有返回任何数据。')
     except Exception as e:
         raise ValueError(f"执行SQL查询时发生错误：{e}")
+
+def iter_sql_query(
+        database: str,
+        sql: str,
+        chunksize: int = 100000,
+        yaml_file_name: str = 'cfg.yaml',
+        custom_path: Optional[str] = None
+    ) -> Iterator[pd.DataFrame]:
+    """
+    流式执行SELECT查询，使用服务端游标逐块返回结果，内存占用由 chunksize 决定
+
+    返回:
+    - 生成器，每次产出最多 chunksize 行的 DataFrame
+    """
+    engine = get_engine(database, yaml_file_name, custom_path)
+    try:
+        with engine.connect().execution_options(stream_results=True, max_row_buffer=chunksize) as conn:
+            for chunk in pd.read_sql(sql, conn, chunksize=chunksize):
+                emit('mysql.query_chunk', database=database, rows=len(chunk))
+                yield chunk
+    except ResourceClosedError:
+        print('查询完成，但没有返回任何数据。')
+    except Exception as e:
+        raise ValueError(f"执行SQL查询时发生错误：{e}")
+
+def sql_query_to_file(
+        database: str,
+        sql: str,
+        file_path: str,
+        file_format: Optional[str] = None,
+        chunksize: int = 100000,
+        yaml_file_name: str = 'cfg.yaml',
+        custom_path: Optional[str] = None
+    ) -> int:
+    """
+    流式执行SELECT查询并逐块写入文件，结果集大小不受内存限制
+
+    参数:
+    - file_path: 输出文件路径，先写入唯一的临时文件，完成后再替换；结果为空时 CSV 只有表头，Parquet 只有 schema
+    - file_format: 'csv' 或 'parquet'，默认按文件后缀判断
+    - chunksize: 每次从服务端读取并写入的行数
+
+    返回:
+    - 写入的总行数
+    """
+    file_format = file_format or os.path.splitext(file_path)[1].lstrip('.').lower()
+    if file_format not in ('csv', 'parquet'):
+        raise ValueError(f"file_format 仅支持 csv 或 parquet，当前为：{file_format}")
+
+    with span('mysql.query_to_file', database=database, format=file_format) as s, atomic_write(file_path) as tmp_path:
+        chunks = iter_sql_query(database, sql, chunksize, yaml_file_name, custom_path)
+        if file_format == 'csv':
+            total_rows = 0
+            header = True
+            for chunk in chunks:
+                chunk.to_csv(tmp_path, index=False, mode='w' if header else 'a', header=header)
+                header = False
+                total_rows += len(chunk)
+        else:
+            total_rows = _write_parquet_chunks(chunks, tmp_path)
+        s.set(rows=total_rows)
+
+    print(f"已写入 {total_rows} 条记录到 {file_path}")
+    return total_rows
+
+def _unified_schema(tables: list, fill_null: bool = True) -> pa.Schema:
+    """合并多块数据的 schema，fill_null 为True时整列为空（null 类型）的列按字符串保存"""
+    schema = pa.unify_schemas([table.schema for table in tables], promote_options='permissive')
+    if fill_null:
+        schema = pa.schema([field.with_type(pa.string()) if pa.types.is_null(field.type) else field for field in schema])
+    return schema
+
+def _open_parquet_writer(file_path: str, tables: list):
+    """按缓存的数据块确定 schema 并创建 ParquetWriter，同时写入这些数据块"""
+    writer = pq.ParquetWriter(file_path, _unified_schema(tables))
+    for table in tables:
+        writer.write_table(table.cast(writer.schema))
+    return writer
+
+def _write_parquet_chunks(chunks: Iterator[pd.DataFrame], file_path: str, max_lookahead: int = 10) -> int:
+    """
+    逐块写入同一个 Parquet 文件，返回总行数
+
+    前几块中整列为空的列无法确定类型，最多缓存 max_lookahead 块后再确定 schema。
+    """
+    buffered = []
+    writer = None
+    total_rows = 0
+    try:
+        for chunk in chunks:
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            total_rows += len(chunk)
+            if writer is not None:
+                writer.write_table(table.cast(writer.schema))
+                continue
+
+            buffered.append(table)
+            schema = _unified_schema(buffered, fill_null=False)
+            if len(buffered) < max_lookahead and any(pa.types.is_null(field.type) for field in schema):
+                continue
+            writer = _open_parquet_writer(file_path, buffered)
+            buffered = []
+
+        if writer is None:
+            # 没有数据块时也写出有效的 Parquet 文件
+            writer = _open_parquet_writer(file_path, buffered) if buffered else pq.ParquetWriter(file_path, pa.schema([]))
+    finally:
+        if writer is not None:
+            writer.close()
+    return total_rows
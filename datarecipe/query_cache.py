@@ -0,0 +1,203 @@
+import os
+import re
+import json
+import time
+import glob
+import hashlib
+from typing import Optional
+import pandas as pd
+import pyarrow as pa
+from .disk_cache import write_json, write_columnar, touch, remove_files, evict_lru, total_size, expired_keys, orphaned_files
+
+# 查询缓存目录默认的容量上限（字节），超出后按最近使用时间淘汰
+DEFAULT_MAX_CACHE_BYTES = 1024 ** 3
+
+# 引号内的字符串/标识符，规范化SQL时保持原样
+_QUOTED_PATTERN = re.compile(r"('(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.)*\"|`[^`]*`)")
+
+# 识别表名用的词法单元：空白和注释丢弃，字符串常量替换为 ''，不受其中 FROM/JOIN 等字样影响
+_TOKEN_PATTERN = re.compile(r"""
+    (?P<skip>\s+|--[^\n]*|\#[^\n]*|/\*.*?\*/)
+  | (?P<literal>'(?:[^'\\]|\\.|'')*'|"(?:[^"\\]|\\.|"")*")
+  | (?P<name>`(?:[^`]|``)+`|\w+)
+  | (?P<symbol>.)
+""", re.VERBOSE | re.DOTALL)
+
+# 结束 FROM 子句的关键字
+_CLAUSE_END_KEYWORDS = {'WHERE', 'GROUP', 'HAVING', 'ORDER', 'LIMIT', 'WINDOW', 'UNION', 'EXCEPT', 'INTERSECT', 'FOR', 'LOCK', 'INTO'}
+# 表引用之后允许出现的关键字；出现其他内容（如 PARTITION、索引提示）时无法可靠识别表名
+_AFTER_TABLE_KEYWORDS = _CLAUSE_END_KEYWORDS | {'ON', 'USING', 'JOIN', 'STRAIGHT_JOIN', 'INNER', 'CROSS', 'LEFT', 'RIGHT', 'NATURAL', 'OUTER'}
+
+def normalize_sql(sql: str) -> str:
+    """合并引号外的连续空白并去掉末尾分号，使格式不同但等价的SQL得到相同的缓存键"""
+    parts = _QUOTED_PATTERN.split(sql.strip().rstrip(';').strip())
+    return ''.join(part if i % 2 else re.sub(r'\s+', ' ', part) for i, part in enumerate(parts))
+
+def query_cache_key(database: str, sql: str, params=None) -> str:
+    """按 (数据库, 规范化的SQL, 参数) 生成缓存键"""
+    key = json.dumps([database, normalize_sql(sql), params], sort_keys=True, default=str)
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+def _tokenize(sql: str) -> list:
+    tokens = []
+    for match in _TOKEN_PATTERN.finditer(sql):
+        if match.lastgroup == 'literal':
+            tokens.append("''")
+        elif match.lastgroup != 'skip':
+            tokens.append(match.group())
+    return tokens
+
+def _is_name(token: str) -> bool:
+    return token[0] == '`' or token[0] == '_' or token[0].isalnum()
+
+def _unquote(token: str) -> str:
+    return token[1:-1].replace('``', '`') if token[0] == '`' else token
+
+def _table_reference(tokens: list, i: int, tables: list):
+    """
+    解析 tokens[i] 开始的一个表引用（表名及别名），记录表名
+
+    返回:
+    - 表引用之后的位置；子查询返回其左括号的位置，由调用方继续扫描；无法可靠识别时返回 None
+    """
+    if i < len(tokens) and tokens[i] == '(':
+        return i if i + 1 < len(tokens) and tokens[i + 1].upper() == 'SELECT' else None
+    if i >= len(tokens) or not _is_name(tokens[i]):
+        return None
+    parts = [_unquote(tokens[i])]
+    i += 1
+    if i + 1 < len(tokens) and tokens[i] == '.' and _is_name(tokens[i + 1]):
+        parts.append(_unquote(tokens[i + 1]))
+        i += 2
+    if i < len(tokens) and tokens[i] == '(':  # 表函数，如 JSON_TABLE(...)
+        return None
+    if len(parts) == 2 or parts[0].upper() != 'DUAL':
+        table = (parts[0], parts[1]) if len(parts) == 2 else (None, parts[0])
+        if table not in tables:
+            tables.append(table)
+
+    if i < len(tokens) and tokens[i].upper() == 'AS':
+        i += 1
+    if i < len(tokens) and _is_name(tokens[i]) and tokens[i].upper() not in _AFTER_TABLE_KEYWORDS:
+        i += 1  # 别名
+    if i == len(tokens) or tokens[i] in (',', ')', ';') or tokens[i].upper() in _AFTER_TABLE_KEYWORDS:
+        return i
+    return None
+
+def referenced_tables(sql: str) -> Optional[list]:
+    """
+    从SQL的 FROM 子句（含逗号分隔的多个表、JOIN 和子查询）中提取表名，忽略注释、字符串常量和
+    EXTRACT(YEAR FROM d) 等函数参数中的 FROM
+
+    返回:
+    - [(库名或None, 表名)]；遇到无法可靠识别的写法（括号内的表列表、表函数、索引提示等）时返回 None
+    """
+    tokens = _tokenize(sql)
+    tables = []
+    # 每层括号的状态：None、'select'（出现过 SELECT）或 'from'（处于 FROM 子句中）
+    states = [None]
+    i = 0
+    while i < len(tokens):
+        token = tokens[i]
+        word = token.upper()
+        if token == '(':
+            states.append(None)
+        elif token == ')':
+            if len(states) > 1:
+                states.pop()
+        elif word == 'SELECT':
+            states[-1] = 'select'
+        elif (word == 'FROM' and states[-1] == 'select') or (states[-1] == 'from' and (token == ',' or word in ('JOIN', 'STRAIGHT_JOIN'))):
+            states[-1] = 'from'
+            i = _table_reference(tokens, i + 1, tables)
+            if i is None:
+                return None
+            continue
+        elif states[-1] == 'from' and word in _CLAUSE_END_KEYWORDS:
+            states[-1] = None
+        i += 1
+    return tables
+
+def _entry_paths(cache_dir: str, key: str):
+    return os.path.join(cache_dir, f"{key}.parquet"), os.path.join(cache_dir, f"{key}.json")
+
+def _remove_entry(cache_dir: str, key: str):
+    remove_files(*_entry_paths(cache_dir, key))
+
+def load_cached_result(cache_dir: str, key: str, ttl: float, versions: dict = None):
+    """
+    读取缓存的查询结果
+
+    参数:
+    - ttl: 有效期（秒）
+    - versions: 当前的表版本（更新时间），与缓存时不一致则视为失效；为None时只按有效期判断
+
+    返回:
+    - 命中时返回 DataFrame，否则返回 None
+    """
+    data_path, meta_path = _entry_paths(cache_dir, key)
+    if not (os.path.exists(data_path) and os.path.exists(meta_path)):
+        return None
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        expired = time.time() - meta['created'] > ttl
+        outdated = versions is not None and meta.get('versions') != versions
+        if expired or outdated:
+            _remove_entry(cache_dir, key)
+            return None
+        df = pd.read_parquet(data_path)
+    except (OSError, ValueError, KeyError, pa.ArrowException):
+        _remove_entry(cache_dir, key)
+        return None
+    touch(data_path)
+    return df
+
+def store_result(cache_dir: str, key: str, df: pd.DataFrame, sql: str, versions: dict = None, max_bytes: int = DEFAULT_MAX_CACHE_BYTES, ttl: float = None) -> bool:
+    """
+    以 Parquet 保存查询结果，并淘汰过期的缓存和超出 max_bytes 的缓存（见 evict_query_cache）
+
+    参数:
+    - ttl: 有效期（秒），记录在元数据中，淘汰时按它判断是否过期；为None时只按容量淘汰
+
+    无法按列式格式保存的结果（如列内类型混杂）会跳过缓存。
+    """
+    data_path, meta_path = _entry_paths(cache_dir, key)
+    if not write_columnar(data_path, lambda tmp_path: df.to_parquet(tmp_path, index=False), "查询结果无法写入缓存"):
+        return False
+    meta = {'created': time.time(), 'versions': versions, 'sql': sql}
+    if ttl is not None:
+        meta['ttl'] = ttl
+    write_json(meta_path, meta)
+
+    evict_query_cache(cache_dir, max_bytes)
+    return True
+
+def evict_query_cache(cache_dir: str, max_bytes: int = DEFAULT_MAX_CACHE_BYTES, ttl: float = float('inf')):
+    """
+    淘汰查询缓存：
+
+    1. 删除过期或元数据损坏的缓存；每条缓存按写入时记录的有效期判断，没有记录的按 ttl
+    2. 删除只有结果或只有元数据的残留文件
+    3. 按最近使用时间淘汰，直到缓存目录总大小（含元数据）不超过 max_bytes
+    """
+    for key in expired_keys(cache_dir, ttl):
+        _remove_entry(cache_dir, key)
+    remove_files(
+        *orphaned_files(glob.glob(os.path.join(cache_dir, '*.parquet')), '.json'),
+        *orphaned_files(glob.glob(os.path.join(cache_dir, '*.json')), '.parquet')
+    )
+
+    meta_bytes = total_size(glob.glob(os.path.join(cache_dir, '*.json')))
+    evict_lru(
+        glob.glob(os.path.join(cache_dir, '*.parquet')), max_bytes - meta_bytes,
+        lambda data_path: _remove_entry(cache_dir, os.path.splitext(os.path.basename(data_path))[0])
+    )
+
+def clear_query_cache(cache_dir: str) -> int:
+    """清除全部查询缓存，返回删除的条目数量"""
+    removed = 0
+    for data_path in glob.glob(os.path.join(cache_dir, '*.parquet')):
+        _remove_entry(cache_dir, os.path.splitext(os.path.basename(data_path))[0])
+        removed += 1
+    return removed
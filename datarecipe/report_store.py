@@ -0,0 +1,121 @@
+import os
+import json
+import time
+import glob
+import hashlib
+import pandas as pd
+import pyarrow as pa
+from .disk_cache import write_json, write_columnar, touch, remove_files, evict_lru, total_size, expired_keys, orphaned_files
+
+# 报告仓库目录默认的容量上限（字节），超出后按最近使用时间淘汰
+DEFAULT_MAX_STORE_BYTES = 2 * 1024 ** 3
+
+# 默认保留时间（秒），超过后同样的请求会重新生成报告
+DEFAULT_STORE_TTL = 24 * 3600
+
+def report_key(body: dict) -> str:
+    """按报告请求体生成仓库键，键顺序不同的相同请求体得到同一个键"""
+    key = json.dumps(body, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+def _entry_paths(store_dir: str, key: str):
+    return os.path.join(store_dir, f"{key}.json"), os.path.join(store_dir, f"{key}.parquet")
+
+def remove_report(store_dir: str, key: str):
+    """删除一个报告的状态和数据"""
+    remove_files(*_entry_paths(store_dir, key))
+
+def load_report_state(store_dir: str, key: str, ttl: float = DEFAULT_STORE_TTL):
+    """
+    读取报告的进度：{'body', 'created', 'ttl', 'report_id', 'report_document_id', 'rows'}
+
+    返回:
+    - 未记录、已超过 ttl 或记录损坏时返回 None（过期和损坏的条目会被删除）
+    """
+    state_path, _ = _entry_paths(store_dir, key)
+    if not os.path.exists(state_path):
+        return None
+    try:
+        with open(state_path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        expired = time.time() - state['created'] > ttl
+    except (OSError, ValueError, KeyError):
+        expired = True
+    if expired:
+        remove_report(store_dir, key)
+        return None
+    return state
+
+def save_report_state(store_dir: str, key: str, **fields) -> dict:
+    """合并并原子写入报告进度，首次写入时记录创建时间"""
+    state_path, _ = _entry_paths(store_dir, key)
+    state = {}
+    if os.path.exists(state_path):
+        try:
+            with open(state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            state = {}
+    state.setdefault('created', time.time())
+    state.update(fields)
+
+    write_json(state_path, state)
+    return state
+
+def load_report_data(store_dir: str, key: str):
+    """
+    读取已下载的报告数据
+
+    返回:
+    - 命中时返回 DataFrame，没有数据或文件损坏时返回 None
+    """
+    _, data_path = _entry_paths(store_dir, key)
+    if not os.path.exists(data_path):
+        return None
+    try:
+        df = pd.read_parquet(data_path)
+    except (OSError, ValueError, pa.ArrowException):
+        remove_files(data_path)
+        return None
+    touch(data_path)
+    return df
+
+def store_report_data(store_dir: str, key: str, df: pd.DataFrame, max_bytes: int = DEFAULT_MAX_STORE_BYTES, ttl: float = DEFAULT_STORE_TTL) -> bool:
+    """
+    以 zstd 压缩的 Parquet 保存报告数据，并淘汰过期的报告和超出 max_bytes 的报告（见 evict_report_store）
+
+    无法按列式格式保存的数据（如列内类型混杂）会跳过保存。
+    """
+    _, data_path = _entry_paths(store_dir, key)
+    if not write_columnar(data_path, lambda tmp_path: df.to_parquet(tmp_path, index=False, compression='zstd'), "报告数据无法写入仓库"):
+        return False
+
+    save_report_state(store_dir, key, rows=len(df))
+    evict_report_store(store_dir, max_bytes, ttl)
+    return True
+
+def evict_report_store(store_dir: str, max_bytes: int = DEFAULT_MAX_STORE_BYTES, ttl: float = DEFAULT_STORE_TTL):
+    """
+    淘汰报告仓库中的报告：
+
+    1. 删除过期或状态损坏的报告，包括从未下载完成的报告；每个报告按创建时记录的保留时间判断，没有记录的按 ttl
+    2. 删除没有状态文件的残留数据
+    3. 按最近使用时间淘汰已下载的报告，直到仓库目录总大小（含状态文件）不超过 max_bytes
+    """
+    for key in expired_keys(store_dir, ttl):
+        remove_report(store_dir, key)
+    remove_files(*orphaned_files(glob.glob(os.path.join(store_dir, '*.parquet')), '.json'))
+
+    state_bytes = total_size(glob.glob(os.path.join(store_dir, '*.json')))
+    evict_lru(
+        glob.glob(os.path.join(store_dir, '*.parquet')), max_bytes - state_bytes,
+        lambda data_path: remove_report(store_dir, os.path.splitext(os.path.basename(data_path))[0])
+    )
+
+def clear_report_store(store_dir: str) -> int:
+    """清除报告仓库中的全部报告（包括未完成的进度），返回删除的报告数量"""
+    removed = 0
+    for state_path in glob.glob(os.path.join(store_dir, '*.json')):
+        remove_report(store_dir, os.path.splitext(os.path.basename(state_path))[0])
+        removed += 1
+    return removed
@@ -2,14 +2,79 @@ import requests
 import json
 import os
 import time
-import gzip
-from io import BytesIO
+import re
+import zlib
+import codecs
 import yaml
-import pymysql
 import inspect
+import asyncio
+import functools
+import threading
 import concurrent.futures
+import numpy as np
 import pandas as pd
-pymysql.install_as_MySQLdb()
+from requests.adapters import HTTPAdapter
+from .report_store import(
+    DEFAULT_STORE_TTL,
+    report_key,
+    load_report_state,
+    save_report_state,
+    load_report_data,
+    store_report_data,
+    remove_report
+)
+from .instrumentation import span, emit
+from .mysql import(
+    WRITE_METHODS,
+    get_engine,
+    clean_dataframe,
+    execute_sql,
+    upsert_df,
+    write_df,
+    _quote_identifier
+)
+
+SP_API_ENDPOINT = "https://sellingpartnerapi-na.amazon.com"
+REPORTS_PATH = "/reports/2021-06-30"
+
+# 各操作的默认限流 (每秒请求数, 突发容量)，与 SP-API Reports 2021-06-30 的用量计划一致
+RATE_LIMITS = {
+    'createReport': (0.0167, 15),
+    'getReport': (2.0, 15),
+    'getReports': (0.0222, 10),
+    'getReportDocument': (0.0167, 15),
+}
+
+# getReports 每页最多返回的报告数，以及每次调用最多指定的报告类型数
+GET_REPORTS_PAGE_SIZE = 100
+GET_REPORTS_MAX_TYPES = 10
+
+# 按 createdSince 批量查询时向前放宽的秒数，容忍本机与 SP-API 之间的时钟偏差
+CREATED_SINCE_MARGIN = 300
+
+# 报告生成失败的终止状态
+FAILED_STATUSES = ('CANCELLED', 'FATAL')
+
+LWA_TOKEN_URL = "https://api.amazon.com/auth/o2/token"
+
+# 共享连接池的大小，应不小于同时发送请求的线程数
+HTTP_POOL_SIZE = 32
+
+_session = None
+_clients = {}  # 配置文件绝对路径 -> SPAPIClient
+_registry_lock = threading.Lock()
+
+def get_session():
+    """返回进程内共享的 requests.Session，连接保持长连接并在线程间复用"""
+    global _session
+    with _registry_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _session = session
+        return _session
 
 def get_credentials(config_name='cfg.yaml'):
     """
@@ -46,7 +111,11 @@ def get_access_token(refresh_token, client_id, client_secret, max_wait_seconds=3
     返回:
     - 成功时返回access_token，失败时抛出异常
     """
-    url = "https://api.amazon.com/auth/o2/token"
+    return _request_token(refresh_token, client_id, client_secret, max_wait_seconds).get("access_token")
+
+def _request_token(refresh_token, client_id, client_secret, max_wait_seconds=300):
+    """向 LWA 换取访问令牌，返回完整响应（含 access_token 和 expires_in），失败时进行等待时间递增重试"""
+    url = LWA_TOKEN_URL
     headers = {"Content-Type": "application/x-www-form-urlencoded;charset=UTF-8"}
     data = {
         "grant_type": "refresh_token",
@@ -61,9 +130,9 @@ def get_access_token(refresh_token, client_id, client_secret, max_wait_seconds=3
     
     while total_wait < max_wait_seconds:
         try:
-            response = requests.post(url, headers=headers, data=data)
+            response = get_session().post(url, headers=headers, data=data)
             response.raise_for_status()
-            return response.json().get("access_token")
+            return response.json()
             
         except requests.exceptions.RequestException as e:
             wait_time = min(base_wait * (2 ** attempt), max_wait_seconds - total_wait)
@@ -72,6 +141,7 @@ def get_access_token(refresh_token, client_id, client_secret, max_wait_seconds=3
                 
             print(f"获取访问令牌失败 (已等待 {total_wait} 秒): {str(e)}")
             print(f"等待 {wait_time} 秒后重试...")
+            emit('sp_api.retry', operation='token', retries=1, wait=wait_time, reason=str(e))
             
             time.sleep(wait_time)
             total_wait += wait_time
@@ -79,6 +149,72 @@ def get_access_token(refresh_token, client_id, client_secret, max_wait_seconds=3
     
     raise Exception(f"获取访问令牌失败，已等待 {total_wait} 秒")
 
+class SPAPIClient:
+    """
+    SP-API 客户端：使用共享连接池的 requests.Session，并缓存访问令牌，在 expires_in 到期前自动刷新，可在多个线程间共用
+
+    参数:
+    - client_id, client_secret, refresh_token: LWA 凭证，默认从配置文件读取
+    - config_name: 配置文件名，默认为'cfg.yaml'
+    - access_token: 固定的访问令牌，指定后不再刷新
+    - refresh_margin: 距离过期还剩多少秒时提前刷新，默认5分钟
+    - timeout: 请求超时(秒)
+    """
+
+    def __init__(self, client_id=None, client_secret=None, refresh_token=None, config_name='cfg.yaml',
+                 access_token=None, refresh_margin=300, timeout=60, session=None):
+        if access_token is None and not (client_id and client_secret and refresh_token):
+            client_id, client_secret, refresh_token = get_credentials(config_name)
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.refresh_token = refresh_token
+        self.refresh_margin = refresh_margin
+        self.timeout = timeout
+        self.session = session or get_session()
+        self._access_token = access_token
+        self._expires_at = float('inf') if access_token else 0.0
+        self._lock = threading.Lock()
+
+    def get_access_token(self, max_wait_seconds=300):
+        """返回缓存的访问令牌，即将过期时刷新；多个线程同时刷新时只请求一次"""
+        with self._lock:
+            if self._access_token is None or time.monotonic() >= self._expires_at - self.refresh_margin:
+                with span('sp_api.token', operation='token'):
+                    token = _request_token(self.refresh_token, self.client_id, self.client_secret, max_wait_seconds)
+                self._access_token = token.get("access_token")
+                self._expires_at = time.monotonic() + float(token.get("expires_in", 3600))
+            return self._access_token
+
+    def invalidate_token(self):
+        """令牌被服务端拒绝时调用，下次请求前重新获取"""
+        with self._lock:
+            if self.refresh_token:
+                self._expires_at = 0.0
+
+    def request(self, method, url, **kwargs):
+        """附带访问令牌发送请求；令牌被拒绝（401/403）时刷新令牌后重试一次"""
+        kwargs.setdefault('timeout', self.timeout)
+        extra_headers = kwargs.pop('headers', {})
+        for attempt in range(2):
+            headers = {"x-amz-access-token": self.get_access_token(), **extra_headers}
+            response = self.session.request(method, url, headers=headers, **kwargs)
+            if response.status_code not in (401, 403) or not self.refresh_token or attempt:
+                return response
+            emit('sp_api.retry', operation='token', retries=1, reason=f"状态码: {response.status_code}")
+            self.invalidate_token()
+        return response
+
+def get_client(config_name='cfg.yaml'):
+    """返回按配置文件共享的 SPAPIClient，多次调用 fetch_sp_api_reports 复用同一个访问令牌"""
+    config_path = os.path.abspath(os.path.join(os.getcwd(), config_name))
+    with _registry_lock:
+        client = _clients.get(config_path)
+    if client is None:
+        client = SPAPIClient(config_name=config_name)
+        with _registry_lock:
+            client = _clients.setdefault(config_path, client)
+    return client
+
 def get_report_id(access_token, report_request_body, max_wait_seconds=300):
     """
     请求创建报告并获取报告ID，失败时进行重试
@@ -91,7 +227,7 @@ def get_report_id(access_token, report_request_body, max_wait_seconds=300):
     返回:
     - 成功时返回report_id，失败时返回None
     """
-    url = "https://sellingpartnerapi-na.amazon.com/reports/2021-06-30/reports"
+    url = f"{SP_API_ENDPOINT}{REPORTS_PATH}/reports"
     headers = {
         "Content-Type": "application/json",
         "x-amz-access-token": access_token,
@@ -103,7 +239,7 @@ def get_report_id(access_token, report_request_body, max_wait_seconds=300):
     
     while total_wait < max_wait_seconds:
         try:
-            response = requests.post(url, headers=headers, json=report_request_body)
+            response = get_session().post(url, headers=headers, json=report_request_body)
             response_data = response.json()
             
             if response.status_code == 202:
@@ -147,7 +283,7 @@ def check_report_status(access_token, report_id, max_wait_seconds=300):
     返回:
     - 成功时返回状态响应，失败时返回None
     """
-    url = f"https://sellingpartnerapi-na.amazon.com/reports/2021-06-30/reports/{report_id}"
+    url = f"{SP_API_ENDPOINT}{REPORTS_PATH}/reports/{report_id}"
     headers = {
         "x-amz-access-token": access_token,
     }
@@ -158,7 +294,7 @@ def check_report_status(access_token, report_id, max_wait_seconds=300):
     
     print(f'报告正在生成中，请等待...')
     while total_wait < max_wait_seconds:
-        status_response = requests.get(url, headers=headers)
+        status_response = get_session().get(url, headers=headers)
         
         if status_response.status_code == 200:
             report_status = status_response.json().get("processingStatus")
@@ -191,14 +327,14 @@ def download_and_process_report(access_token, report_document_id):
     :return: 解析后的 JSON 数据，如果失败则返回 None
     """
 
-    url = f"https://sellingpartnerapi-na.amazon.com/reports/2021-06-30/documents/{report_document_id}"
+    url = f"{SP_API_ENDPOINT}{REPORTS_PATH}/documents/{report_document_id}"
     headers = {
         "x-amz-access-token": access_token,
         'compressionAlgorithm': 'GZIP'
 
     }
     # 发起请求以获取下载 URL
-    report_response = requests.get(url, headers=headers)
+    report_response = get_session().get(url, headers=headers)
     if report_response.status_code == 200:
         # 获取下载 URL
         download_url = report_response.json().get("url")
@@ -209,16 +345,15 @@ def download_and_process_report(access_token, report_document_id):
             return None
 
         # 下载 URL 获取报告内容, stream=True 流式下载 减少内存占用
-        response = requests.get(download_url, stream=True)
+        response = get_session().get(download_url, stream=True)
 
         # 检查响应状态是否成功
         if response.status_code == 200:
             try:
-                # 解压缩报告数据并解析为 JSON 格式
-                with gzip.GzipFile(fileobj=BytesIO(response.content)) as gz:
-                    json_data = json.load(gz)
-                    print(f"报告数据已下载并解析为 JSON 格式")
-                    return json_data
+                # 边下载边解压，不在内存中同时保留压缩数据的副本
+                json_data = json.loads(''.join(_iter_report_text(response)))
+                print(f"报告数据已下载并解析为 JSON 格式")
+                return json_data
             except Exception as e:
                 print(f"Error: Failed to parse report data as JSON: {e}")
                 return None
@@ -230,12 +365,332 @@ def download_and_process_report(access_token, report_document_id):
         print(f'Error: 无法获取报告下载链接，状态码：{report_response.status_code}')
         return None
 
-def process_json_to_df(json_data):
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_JSON_DECODER = json.JSONDecoder()
+
+def _iter_report_text(response, chunk_size=1024 * 1024):
+    """逐块读取下载响应，gzip 内容边下载边解压（每次解压出的文本不超过 chunk_size），按 UTF-8 增量解码为文本"""
+    decompressor = None
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    received = 0
+    # 流式处理时下载、解压与调用方的解析交替进行，耗时包含调用方处理数据的时间
+    with span('sp_api.download') as s:
+        for chunk in response.iter_content(chunk_size):
+            received += len(chunk)
+            if decompressor is None:
+                # 按文件头判断是否为 gzip，wbits=47 同时接受 gzip 与 zlib 格式
+                decompressor = zlib.decompressobj(47) if chunk[:2] == b'\x1f\x8b' else False
+            if not decompressor:
+                yield decoder.decode(chunk)
+                continue
+            while chunk:
+                yield decoder.decode(decompressor.decompress(chunk, chunk_size))
+                chunk = decompressor.unconsumed_tail
+        if decompressor:
+            yield decoder.decode(decompressor.flush())
+        yield decoder.decode(b'', final=True)
+        s.set(bytes=received, compressed=bool(decompressor))
+
+def iter_json_records(text_chunks):
+    """
+    增量解析 JSON 文档，逐条产出 (顶层键, 记录)
+
+    顶层数组中的每个元素各为一条记录，其他顶层值整体作为一条记录；文档本身是数组时键为 None。
+    只缓存尚未解析的文本，内存占用与单条记录的大小相当，与文档大小无关。
+    """
+    chunks = iter(text_chunks)
+    buf = ''
+    pos = 0
+
+    def read_more():
+        nonlocal buf, pos
+        for chunk in chunks:
+            if chunk:
+                buf = buf[pos:] + chunk
+                pos = 0
+                return True
+        return False
+
+    def next_char():
+        """跳过空白并返回下一个字符（不消费），文档结束时返回空字符串"""
+        nonlocal pos
+        while True:
+            pos = _WHITESPACE.match(buf, pos).end()
+            if pos < len(buf):
+                return buf[pos]
+            if not read_more():
+                return ''
+
+    def decode_value():
+        """解析一个完整的值；文本在值的中途被截断时读入更多数据后重试"""
+        nonlocal pos
+        while True:
+            try:
+                value, end = _JSON_DECODER.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                end = None
+            # 数字在缓冲区末尾或其后紧跟数字字符（如 '-3' 后的 '.0' 尚未读入）时可能还没读完
+            if end is not None and (buf[end - 1] in '}]"' or (end < len(buf) and buf[end] not in '0123456789.eE+-')):
+                pos = end
+                return value
+            if not read_more():
+                if end is None:
+                    raise ValueError("报告 JSON 不完整或格式错误")
+                pos = end
+                return value
+
+    def expect(char):
+        nonlocal pos
+        if next_char() != char:
+            raise ValueError(f"报告 JSON 格式错误：位置 {pos} 处应为 {char!r}")
+        pos += 1
+
+    def array_items(key):
+        nonlocal pos
+        while True:
+            char = next_char()
+            if char == ']':
+                pos += 1
+                return
+            if char == ',':
+                pos += 1
+                continue
+            if not char:
+                raise ValueError("报告 JSON 不完整")
+            yield key, decode_value()
+
+    if next_char() == '[':
+        pos += 1
+        yield from array_items(None)
+        return
+
+    expect('{')
+    while True:
+        char = next_char()
+        if char == '}':
+            return
+        if char == ',':
+            pos += 1
+            continue
+        if not char:
+            raise ValueError("报告 JSON 不完整")
+        key = decode_value()
+        expect(':')
+        if next_char() == '[':
+            pos += 1
+            yield from array_items(key)
+        else:
+            yield key, decode_value()
+
+def _iter_record_batches(records, batch_size, record_keys=None):
+    """把 (键, 记录) 流按键分组成不超过 batch_size 条的批次"""
+    batch_key = None
+    batch = []
+    for key, record in records:
+        if record_keys is not None and key not in record_keys:
+            continue
+        if batch and (key != batch_key or len(batch) >= batch_size):
+            yield batch_key, batch
+            batch = []
+        batch_key = key
+        batch.append(record)
+    if batch:
+        yield batch_key, batch
+
+def _open_download(http_session, download_url, timeout=60):
+    """以流式方式打开报告文档的下载"""
+    response = http_session.get(download_url, stream=True, timeout=timeout)
+    response.raise_for_status()
+    return response
+
+def _open_document(client, report_document_id, endpoint=SP_API_ENDPOINT):
+    """获取报告文档的下载链接并以流式方式打开下载"""
+    response = client.request('GET', f"{endpoint.rstrip('/')}{REPORTS_PATH}/documents/{report_document_id}")
+    response.raise_for_status()
+    download_url = response.json().get("url")
+    if not download_url:
+        raise Exception(f"报告文档 {report_document_id} 没有下载链接")
+    return _open_download(client.session, download_url, client.timeout)
+
+def iter_report_batches(report_document_id, batch_size=10000, record_keys=None, client=None, endpoint=SP_API_ENDPOINT):
+    """
+    流式下载报告文档，边解压边解析，按批次产出记录，内存占用由 batch_size 决定
+
+    参数:
+    - report_document_id: 报告文档ID
+    - batch_size: 每批记录数
+    - record_keys: 只产出这些顶层键下的记录（如 ['salesByAsin']），默认全部
+    - client: SPAPIClient，默认使用 get_client() 共享的客户端
+    - endpoint: SP-API 地址
+
+    返回:
+    - 生成器，每次产出 (顶层键, 记录列表)
+    """
+    client = client or get_client()
+    with _open_document(client, report_document_id, endpoint) as response:
+        yield from _iter_record_batches(iter_json_records(_iter_report_text(response)), batch_size, record_keys)
+
+def spool_report(report_document_id, spool_dir, record_keys=None, client=None, endpoint=SP_API_ENDPOINT):
+    """
+    流式下载报告文档，把每个顶层键下的记录逐行写入 spool_dir/{键}.jsonl
+
+    返回:
+    - {顶层键: (文件路径, 记录数)}
+    """
+    client = client or get_client()
+    os.makedirs(spool_dir, exist_ok=True)
+    files = {}
+    counts = {}
+    try:
+        with _open_document(client, report_document_id, endpoint) as response:
+            for key, record in iter_json_records(_iter_report_text(response)):
+                if record_keys is not None and key not in record_keys:
+                    continue
+                if key not in files:
+                    files[key] = open(os.path.join(spool_dir, f"{key or 'records'}.jsonl.tmp"), 'w', encoding='utf-8')
+                    counts[key] = 0
+                files[key].write(json.dumps(record, ensure_ascii=False))
+                files[key].write('\n')
+                counts[key] += 1
+    finally:
+        for f in files.values():
+            f.close()
+
+    spooled = {}
+    for key, f in files.items():
+        file_path = f.name[:-len('.tmp')]
+        os.replace(f.name, file_path)
+        spooled[key] = (file_path, counts[key])
+    return spooled
+
+# 报告类型 -> 报告结构：record_key 为数据行所在的顶层数组，dtypes 为展开后的列（嵌套字段以 . 连接）的类型
+REPORT_SCHEMAS = {
+    'GET_VENDOR_SALES_REPORT': {
+        'record_key': 'salesByAsin',
+        'dtypes': {
+            'startDate': 'datetime64[ns]',
+            'endDate': 'datetime64[ns]',
+            'customerReturns': 'Int64',
+            'orderedRevenue.amount': 'float64',
+            'orderedUnits': 'Int64',
+            'shippedCogs.amount': 'float64',
+            'shippedRevenue.amount': 'float64',
+            'shippedUnits': 'Int64',
+        },
+    },
+    'GET_VENDOR_INVENTORY_REPORT': {
+        'record_key': 'inventoryByAsin',
+        'dtypes': {
+            'startDate': 'datetime64[ns]',
+            'endDate': 'datetime64[ns]',
+            'sellableOnHandInventoryUnits': 'Int64',
+            'sellableOnHandInventoryCost.amount': 'float64',
+            'unsellableOnHandInventoryUnits': 'Int64',
+            'unsellableOnHandInventoryCost.amount': 'float64',
+            'openPurchaseOrderUnits': 'Int64',
+        },
+    },
+    'GET_VENDOR_TRAFFIC_REPORT': {
+        'record_key': 'trafficByAsin',
+        'dtypes': {
+            'startDate': 'datetime64[ns]',
+            'endDate': 'datetime64[ns]',
+            'glanceViews': 'Int64',
+        },
+    },
+    'GET_PROMOTION_PERFORMANCE_REPORT': {
+        'record_key': 'promotions',
+        'dtypes': {},
+    },
+    'GET_COUPON_PERFORMANCE_REPORT': {
+        'record_key': 'coupons',
+        'dtypes': {},
+    },
+}
+
+def register_report_schema(report_type, record_key, dtypes=None):
+    """
+    注册或覆盖报告结构，process_json_to_df 按此展开该类型的报告
+
+    参数:
+    - report_type: 报告类型，如 'GET_VENDOR_SALES_REPORT'
+    - record_key: 数据行所在的顶层数组的键
+    - dtypes: {列名: 类型}，列名为展开后的名称（嵌套字段以 . 连接），类型如 'datetime64[ns]'、'float64'、'Int64'
+    """
+    REPORT_SCHEMAS[report_type] = {'record_key': record_key, 'dtypes': dict(dtypes or {})}
+
+def _typed_array(values, dtype=None):
+    """把一列值转换为指定类型的数组，未指定类型时交给 DataFrame 推断"""
+    if dtype is None:
+        return values
+    if str(dtype).startswith('datetime64'):
+        return pd.to_datetime(values, errors='coerce')
+    if dtype in ('float64', float):
+        return np.array(values, dtype=np.float64)
+    return pd.array(values, dtype=dtype)
+
+def flatten_records(records, dtypes=None):
+    """
+    一次遍历把记录列表展开为按列的 DataFrame：嵌套字典展开为以 . 连接的列名，列表保持为单元格的值
+
+    与 pd.json_normalize(records) 的列名和列顺序一致，但直接按列收集值，dtypes 中的列直接生成对应类型的数组。
+    列按首次出现的顺序排列；与 json_normalize 相同，每条记录中顶层的非嵌套字段排在展开的嵌套字段之前，嵌套字典内部保持原有顺序。
+    """
+    dtypes = dtypes or {}
+    columns = {}
+    row_count = 0
+    root = {}  # 字段名 -> [列, 嵌套字段的子树, 列名]，列名只在首次出现时拼接
+
+    def collect(record, tree, prefix, nested_last=False):
+        filled = 0
+        nested = None
+        for key, value in record.items():
+            entry = tree.get(key)
+            if entry is None:
+                entry = tree[key] = [None, None, f"{prefix}{key}"]
+            if type(value) is dict:
+                if entry[1] is None:
+                    entry[1] = {}
+                if nested_last:
+                    if nested is None:
+                        nested = []
+                    nested.append((entry, value))
+                else:
+                    filled += collect(value, entry[1], f"{entry[2]}.")
+                continue
+            column = entry[0]
+            if column is None:
+                column = entry[0] = columns[entry[2]] = [None] * row_count
+            column.append(value)
+            filled += 1
+        if nested:
+            for entry, value in nested:
+                filled += collect(value, entry[1], f"{entry[2]}.")
+        return filled
+
+    for record in records:
+        # 本行缺少的列补 None
+        if collect(record, root, '', nested_last=True) != len(columns):
+            for column in columns.values():
+                if len(column) == row_count:
+                    column.append(None)
+        row_count += 1
+
+    return pd.DataFrame(
+        {name: _typed_array(values, dtypes.get(name)) for name, values in columns.items()},
+        index=pd.RangeIndex(row_count)
+    )
+
+def process_json_to_df(json_data, report_type=None):
     """
     将JSON格式的报告数据转换为DataFrame
+
+    已在 REPORT_SCHEMAS 中登记的报告类型只展开数据行所在的数组（如 salesByAsin），并按登记的类型生成列；
+    其他报告仍使用 pd.json_normalize 展开整个文档。
     
     参数:
     - json_data: JSON格式的报告数据
+    - report_type: 报告类型，默认取 json_data['reportSpecification']['reportType']
     
     返回:
     - pandas DataFrame
@@ -243,9 +698,17 @@ def process_json_to_df(json_data):
     try:
         if not json_data:
             return None
-            
-        # 直接将JSON数据转换为DataFrame
-        df = pd.json_normalize(json_data)
+
+        if report_type is None and isinstance(json_data, dict):
+            report_type = json_data.get('reportSpecification', {}).get('reportType')
+        schema = REPORT_SCHEMAS.get(report_type)
+        with span('sp_api.normalize', report_type=report_type, schema=bool(schema)) as s:
+            if schema and isinstance(json_data, dict) and schema['record_key'] in json_data:
+                df = flatten_records(json_data[schema['record_key']], schema['dtypes'])
+            else:
+                # 直接将JSON数据转换为DataFrame
+                df = pd.json_normalize(json_data)
+            s.set(rows=len(df))
         return df
             
     except Exception as e:
@@ -299,7 +762,7 @@ def process_single_report(access_token, request, max_wait_seconds=300):
     json_data = download_and_process_report(access_token, report_document_id)
     if json_data:
         # 4. 转换为DataFrame
-        df = process_json_to_df(json_data)
+        df = process_json_to_df(json_data, report_body.get("reportType"))
         if df is not None and not df.empty:
             result["data"] = df
             result["status"] = "success"
@@ -314,9 +777,407 @@ def process_single_report(access_token, request, max_wait_seconds=300):
         print(f"{result['message']}")
         return report_name, result
 
-def fetch_sp_api_reports(report_requests, max_wait_seconds=300, max_workers=3):
+class _TokenBucket:
+    """令牌桶限流：每秒补充 rate 个令牌，最多累积 burst 个"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class _AsyncReportSession:
+    """一次异步抓取共用的状态：SP-API 客户端、接口地址、每个操作的令牌桶、执行阻塞 HTTP 请求的线程池和报告仓库"""
+
+    def __init__(self, client, endpoint, executor, max_wait_seconds=300, rate_limits=None, store_dir=None, store_ttl=DEFAULT_STORE_TTL):
+        self.client = client
+        self.store_dir = store_dir
+        self.store_ttl = store_ttl
+        self.inflight = {}  # 请求体的键 -> 正在获取该报告的任务，相同请求体只获取一次
+        self.base_url = f"{endpoint.rstrip('/')}{REPORTS_PATH}"
+        self.executor = executor
+        self.max_wait_seconds = max_wait_seconds
+        limits = {**RATE_LIMITS, **(rate_limits or {})}
+        self.buckets = {operation: _TokenBucket(rate, burst) for operation, (rate, burst) in limits.items()}
+        self.poller = _ReportPoller(self)
+
+    async def run_blocking(self, func, *args, **kwargs):
+        """在线程池中执行阻塞函数"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+
+    async def request(self, operation, method, path, **kwargs):
+        """按操作限流后发送请求；429、5xx 响应和网络异常按递增等待时间重试，超过 max_wait_seconds 后抛出异常"""
+        total_wait = 0
+        attempt = 0
+        base_wait = 2  # 基础等待时间2秒
+
+        while True:
+            queued_at = time.perf_counter()
+            await self.buckets[operation].acquire()
+            with span('sp_api.request', operation=operation, attempt=attempt, queued=time.perf_counter() - queued_at) as s:
+                try:
+                    response = await self.run_blocking(self.client.request, method, f"{self.base_url}{path}", **kwargs)
+                    s.set(status_code=response.status_code)
+                    if response.status_code != 429 and response.status_code < 500:
+                        return response
+                    error = f"状态码: {response.status_code}"
+                except requests.exceptions.RequestException as e:
+                    error = str(e)
+                    s.set(error=error)
+
+            wait_time = min(base_wait * (2 ** attempt), self.max_wait_seconds - total_wait)
+            if wait_time <= 0:
+                raise Exception(f"{operation} 请求失败，已等待 {total_wait} 秒：{error}")
+            print(f"{operation} 请求失败 ({error})，等待 {wait_time} 秒后重试...")
+            emit('sp_api.retry', operation=operation, retries=1, wait=wait_time, reason=error)
+            await asyncio.sleep(wait_time)
+            total_wait += wait_time
+            attempt += 1
+
+def _download_document(session, download_url, timeout=60):
+    """流式下载报告文档并解析为 JSON，gzip 内容边下载边解压"""
+    with session.get(download_url, stream=True, timeout=timeout) as response:
+        response.raise_for_status()
+        return json.loads(''.join(_iter_report_text(response)))
+
+def _download_report(http_session, download_url, report_type, timeout=60, batch_size=10000):
+    """
+    下载报告并转换为 DataFrame
+
+    已在 REPORT_SCHEMAS 中登记的报告边下载边解析，每 batch_size 条记录展开一次后合并，不在内存中保留完整的文档文本和解析后的文档；
+    其他报告整体解析后交给 process_json_to_df
+    """
+    if report_type not in REPORT_SCHEMAS:
+        return process_json_to_df(_download_document(http_session, download_url, timeout), report_type)
+    frames = list(_report_frames(http_session, download_url, report_type, batch_size, timeout))
+    if not frames:
+        return None
+    return frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+
+class _ReportPoller:
+    """
+    批量轮询报告状态。getReports 不能按 reportId 过滤，每轮按未完成报告的 reportTypes（每次最多 GET_REPORTS_MAX_TYPES 种）
+    和其中最早的创建时间（createdSince）查询，用 nextToken 翻页并在本地按 reportId 匹配，等待的报告都出现后不再翻页。
+    不知道类型或创建时间的报告（如旧版本报告仓库中记录的报告）和列表中没有出现的报告，逐个用 getReport 查询。
+    完成的报告立即交给等待方，每轮的请求数与同时等待的报告数基本无关
+    """
+
+    def __init__(self, session, base_interval=2, max_interval=30):
+        self.session = session
+        self.base_interval = base_interval
+        self.max_interval = max_interval
+        self.pending = {}  # reportId -> Future
+        self.details = {}  # reportId -> (reportType, 创建时间戳)
+        self.task = None
+
+    async def wait(self, report_id, report_type=None, created_time=None):
+        """
+        等待报告生成完成，等待期间不占用线程
+
+        参数:
+        - report_type、created_time: 报告类型和创建时间戳，两者都有时才参与 getReports 批量查询，否则用 getReport 单独查询
+
+        返回:
+        - 元组 (状态, reportDocumentId)：状态为 'DONE'、生成失败的状态（见 FAILED_STATUSES）或超过 max_wait_seconds 时的 'TIMEOUT'
+        """
+        future = asyncio.get_running_loop().create_future()
+        self.pending[report_id] = future
+        self.details[report_id] = (report_type, created_time)
+        if self.task is None or self.task.done():
+            self.task = asyncio.ensure_future(self._run())
+        try:
+            return await asyncio.wait_for(future, self.session.max_wait_seconds)
+        except asyncio.TimeoutError:
+            print(f'报告 {report_id} 生成超时，已等待 {self.session.max_wait_seconds} 秒')
+            return 'TIMEOUT', None
+        finally:
+            self.pending.pop(report_id, None)
+            self.details.pop(report_id, None)
+
+    async def _run(self):
+        interval = self.base_interval
+        try:
+            while self.pending:
+                await asyncio.sleep(interval)
+                by_type = {}
+                unlisted = []
+                for report_id, future in list(self.pending.items()):
+                    if future.done():
+                        continue
+                    report_type, created_time = self.details.get(report_id, (None, None))
+                    if report_type and created_time:
+                        by_type.setdefault(report_type, []).append((report_id, created_time))
+                    else:
+                        unlisted.append(report_id)
+
+                report_types = sorted(by_type)
+                for start in range(0, len(report_types), GET_REPORTS_MAX_TYPES):
+                    reports = [report for report_type in report_types[start:start + GET_REPORTS_MAX_TYPES] for report in by_type[report_type]]
+                    unlisted += await self._poll(report_types[start:start + GET_REPORTS_MAX_TYPES], reports)
+                for report_id in unlisted:
+                    await self._poll_one(report_id)
+                interval = min(interval * 2, self.max_interval)
+        except Exception as e:
+            for future in self.pending.values():
+                if not future.done():
+                    future.set_exception(e)
+
+    async def _poll(self, report_types, reports):
+        """
+        用 getReports 查询 report_types 中自最早创建时间以来的报告
+
+        参数:
+        - reports: 等待中的 [(reportId, 创建时间戳)]
+
+        返回:
+        - 翻完所有页仍没有出现的 reportId 列表；请求失败时返回空列表，下一轮重试
+        """
+        missing = {report_id for report_id, _ in reports}
+        created_since = min(created_time for _, created_time in reports) - CREATED_SINCE_MARGIN
+        params = {
+            'reportTypes': ','.join(report_types),
+            'createdSince': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(created_since)),
+            'pageSize': GET_REPORTS_PAGE_SIZE,
+        }
+        while missing:
+            response = await self.session.request('getReports', 'GET', "/reports", params=params)
+            if response.status_code != 200:
+                print(f"批量查询报告状态失败，状态码: {response.status_code}")
+                return []
+            payload = response.json()
+            for report in payload.get("reports", []):
+                missing.discard(report.get("reportId"))
+                self._settle(report)
+            if not payload.get("nextToken"):
+                break
+            # 翻页时 nextToken 必须是唯一的参数
+            params = {'nextToken': payload["nextToken"]}
+        return list(missing)
+
+    async def _poll_one(self, report_id):
+        """用 getReport 单独查询一个报告"""
+        response = await self.session.request('getReport', 'GET', f"/reports/{report_id}")
+        if response.status_code != 200:
+            print(f"查询报告 {report_id} 状态失败，状态码: {response.status_code}")
+            return
+        self._settle(response.json())
+
+    def _settle(self, report):
+        """报告完成或失败时把结果交给等待方，其他状态和不在等待中的报告忽略"""
+        future = self.pending.get(report.get("reportId"))
+        if future is None or future.done():
+            return
+        report_status = report.get("processingStatus")
+        if report_status == 'DONE':
+            future.set_result((report_status, report.get("reportDocumentId")))
+        elif report_status in FAILED_STATUSES:
+            print(f'报告 {report.get("reportId")} 生成失败，状态：{report_status}')
+            future.set_result((report_status, None))
+
+async def _resolve_document(session, body, key):
+    """
+    创建报告（或继续等待上次创建的报告）并轮询到生成完成；指定报告仓库时记录每一步的进度
+
+    返回:
+    - 元组 (reportDocumentId, 失败时的消息)
+    """
+    store_dir = session.store_dir
+    state = (load_report_state(store_dir, key, session.store_ttl) if store_dir else None) or {}
+    if state.get("report_document_id"):
+        return state["report_document_id"], ""
+
+    # 1. 创建报告请求，或继续等待上次创建的报告
+    report_id = state.get("report_id")
+    created_time = state.get("report_created")
+    if report_id:
+        print(f"继续等待上次创建的报告 {report_id}")
+    else:
+        created_time = time.time()
+        response = await session.request('createReport', 'POST', "/reports", json=body)
+        report_id = response.json().get("reportId") if response.status_code == 202 else None
+        if not report_id:
+            return None, f"获取报告ID失败，状态码: {response.status_code}"
+        if store_dir:
+            save_report_state(store_dir, key, body=body, ttl=session.store_ttl, report_id=report_id, report_created=created_time)
+
+    # 2. 检查报告状态并获取 document ID
+    with span('sp_api.poll_wait', report_id=report_id) as s:
+        report_status, report_document_id = await session.poller.wait(report_id, body.get("reportType"), created_time)
+        s.set(status=report_status)
+    if not report_document_id:
+        # 生成失败的报告下次重新创建；超时的报告保留 reportId，下次继续等待
+        if store_dir and report_status in FAILED_STATUSES:
+            remove_report(store_dir, key)
+        return None, "获取报告状态失败"
+    if store_dir:
+        save_report_state(store_dir, key, report_document_id=report_document_id)
+    return report_document_id, ""
+
+async def _document_url(session, report_document_id):
+    """
+    获取报告文档的下载链接
+
+    返回:
+    - 元组 (下载链接, 失败时的消息)
+    """
+    response = await session.request('getReportDocument', 'GET', f"/documents/{report_document_id}")
+    document = response.json() if response.status_code == 200 else {}
+    if not document.get("url"):
+        return None, f"无法获取报告下载链接，状态码: {response.status_code}"
+    return document["url"], ""
+
+async def _fetch_report(session, body, key):
+    """
+    获取一个报告：依次创建、轮询、获取文档、下载并转换；指定报告仓库时已下载的报告直接从仓库读取，
+    未完成的报告从上次中断的步骤继续
+
+    返回:
+    - 结果字典
+    """
+    result = {
+        "data": None,
+        "status": "failed",
+        "message": ""
+    }
+    store_dir = session.store_dir
+    state = (load_report_state(store_dir, key, session.store_ttl) if store_dir else None) or {}
+    if state.get("rows") is not None:
+        df = await session.run_blocking(load_report_data, store_dir, key)
+        if df is not None:
+            result["data"] = df
+            result["status"] = "success"
+            result["message"] = "报告已从本地仓库读取"
+            return result
+
+    report_document_id, result["message"] = await _resolve_document(session, body, key)
+    if not report_document_id:
+        return result
+
+    # 3. 获取下载链接并下载报告
+    download_url, result["message"] = await _document_url(session, report_document_id)
+    if not download_url:
+        return result
+
+    # 4. 下载并转换为DataFrame
+    df = await session.run_blocking(
+        _download_report, session.client.session, download_url, body.get("reportType"), session.client.timeout
+    )
+    if df is None or df.empty:
+        result["message"] = "处理报告数据失败或数据为空"
+        return result
+
+    if store_dir:
+        await session.run_blocking(store_report_data, store_dir, key, df, ttl=session.store_ttl)
+    result["data"] = df
+    result["status"] = "success"
+    result["message"] = "报告获取成功"
+    return result
+
+async def _process_report_async(session, request):
     """
-    集成获取认证和请求报告的完整流程，使用并发处理多个报告请求，支持单个或多个报告请求
+    异步处理单个报告的完整流程，请求体相同的报告共用一次获取
+
+    返回:
+    - 元组 (报告名称, 结果字典)
+    """
+    report_name = request["name"]
+    print(f"\n开始获取 {report_name} 报告...")
+
+    key = report_key(request["body"])
+    task = session.inflight.get(key)
+    shared = task is not None
+    with span('sp_api.report', name=report_name, report_type=request["body"].get("reportType"), shared=shared) as s:
+        if not shared:
+            task = session.inflight[key] = asyncio.ensure_future(_fetch_report(session, request["body"], key))
+        result = dict(await asyncio.shield(task))
+        if shared and result["data"] is not None:
+            result["data"] = result["data"].copy()
+        s.set(status=result["status"], rows=len(result["data"]) if result["data"] is not None else 0)
+
+    print(f"{report_name}: {result['message']}")
+    return report_name, result
+
+async def fetch_sp_api_reports_async(report_requests, max_wait_seconds=300, max_workers=8, access_token=None, endpoint=SP_API_ENDPOINT, rate_limits=None, client=None, store_dir=None, store_ttl=DEFAULT_STORE_TTL):
+    """
+    异步获取多个报告：所有报告的创建、轮询和下载同时调度，轮询等待不占用线程，每个接口操作按令牌桶限流
+
+    参数:
+    - report_requests: 列表或字典，格式同 fetch_sp_api_reports
+    - max_wait_seconds: 每个步骤的最大等待时间(秒)，默认5分钟
+    - max_workers: 同时进行的 HTTP 请求数（线程池大小），默认8
+    - access_token: 固定的访问令牌，默认使用 get_client() 共享的客户端及其缓存的令牌
+    - endpoint: SP-API 地址，可指向本地的模拟服务
+    - rate_limits: 覆盖默认限流的字典 {操作名: (每秒请求数, 突发容量)}，操作名见 RATE_LIMITS
+    - client: 使用指定的 SPAPIClient
+    - store_dir: 报告仓库目录，见 fetch_sp_api_reports
+    - store_ttl: 报告在仓库中的保留时间(秒)
+
+    返回:
+    - 元组 (results, all_success)，格式同 fetch_sp_api_reports
+    """
+    # 确保report_requests是列表格式
+    if isinstance(report_requests, dict):
+        report_requests = [report_requests]
+
+    if client is None:
+        client = SPAPIClient(access_token=access_token) if access_token else get_client()
+    await asyncio.to_thread(client.get_access_token, max_wait_seconds)
+
+    results = {}
+    all_success = True
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        session = _AsyncReportSession(client, endpoint, executor, max_wait_seconds, rate_limits, store_dir, store_ttl)
+        outcomes = await asyncio.gather(
+            *(_process_report_async(session, request) for request in report_requests),
+            return_exceptions=True
+        )
+
+    for request, outcome in zip(report_requests, outcomes):
+        if isinstance(outcome, Exception):
+            error_result = {
+                "data": None,
+                "status": "failed",
+                "message": f"处理报告时发生错误: {str(outcome)}"
+            }
+            results[request["name"]] = error_result
+            all_success = False
+            print(f"{error_result['message']}")
+            continue
+        name, result = outcome
+        results[name] = result
+        if result["status"] != "success":
+            all_success = False
+
+    return results, all_success
+
+def _run_coroutine(coroutine):
+    """在同步代码中运行协程；当前线程已有运行中的事件循环时（如 Jupyter）改在新线程中运行"""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coroutine).result()
+
+def fetch_sp_api_reports(report_requests, max_wait_seconds=300, max_workers=8, access_token=None, endpoint=SP_API_ENDPOINT, rate_limits=None, client=None, store_dir=None, store_ttl=DEFAULT_STORE_TTL):
+    """
+    集成获取认证和请求报告的完整流程，并发处理多个报告请求，支持单个或多个报告请求
+
+    同步封装 fetch_sp_api_reports_async：所有报告同时调度，轮询等待不占用线程，按接口操作限流。
     
     参数:
     - report_requests: 列表或字典，包含报告请求信息。格式为:
@@ -332,7 +1193,14 @@ def fetch_sp_api_reports(report_requests, max_wait_seconds=300, max_workers=3):
         }
         多个请求: [请求1, 请求2, ...]
     - max_wait_seconds: 最大等待时间(秒)，默认5分钟
-    - max_workers: 最大并发工作线程数，默认3
+    - max_workers: 同时进行的 HTTP 请求数，默认8
+    - access_token: 固定的访问令牌，默认使用 get_client() 共享的客户端，令牌在多次调用间缓存并在过期前刷新
+    - endpoint: SP-API 地址，可指向本地的模拟服务
+    - rate_limits: 覆盖默认限流的字典 {操作名: (每秒请求数, 突发容量)}
+    - client: 使用指定的 SPAPIClient
+    - store_dir: 报告仓库目录，默认不使用。按请求体记录 reportId、reportDocumentId 和下载的数据（zstd 压缩的 Parquet），
+      再次请求相同的请求体时直接返回已下载的数据，中断的报告从上次的步骤继续，不重新生成
+    - store_ttl: 报告在仓库中的保留时间(秒)，默认1天
     
     返回:
     - 元组 (results, all_success)
@@ -343,52 +1211,244 @@ def fetch_sp_api_reports(report_requests, max_wait_seconds=300, max_workers=3):
       all_success: 布尔值，表示是否所有报告都成功获取
     """
     try:
-        # 确保report_requests是列表格式
-        if isinstance(report_requests, dict):
-            report_requests = [report_requests]
-            
-        # 1. 获取认证信息
-        client_id, client_secret, refresh_token = get_credentials()
-        
-        # 2. 获取访问令牌
-        access_token = get_access_token(refresh_token, client_id, client_secret, max_wait_seconds)
-        
-        results = {}
-        all_success = True
-        
-        # 3. 使用线程池并发处理报告请求
-        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-            # 提交所有任务
-            future_to_report = {
-                executor.submit(process_single_report, access_token, request, max_wait_seconds): request["name"]
-                for request in report_requests
-            }
-            
-            # 获取结果
-            for future in concurrent.futures.as_completed(future_to_report):
-                report_name = future_to_report[future]
-                try:
-                    name, result = future.result()
-                    results[name] = result
-                    if result["status"] != "success":
-                        all_success = False
-                except Exception as e:
-                    error_result = {
-                        "data": None,
-                        "status": "failed",
-                        "message": f"处理报告时发生错误: {str(e)}"
-                    }
-                    results[report_name] = error_result
-                    all_success = False
-                    print(f"{error_result['message']}")
-                
-        return results, all_success
-            
+        return _run_coroutine(fetch_sp_api_reports_async(
+            report_requests, max_wait_seconds, max_workers, access_token, endpoint, rate_limits, client, store_dir, store_ttl
+        ))
     except Exception as e:
         error_message = f"获取报告过程中发生错误: {str(e)}"
         print(f"{error_message}")
         return None, False
 
+PIPELINE_MODES = ('upsert', 'append')
+
+def _report_frames(http_session, download_url, report_type, batch_size, timeout=60):
+    """流式下载报告文档并逐批转换为 DataFrame；未登记结构的报告整体下载转换后再按 batch_size 切分"""
+    schema = REPORT_SCHEMAS.get(report_type)
+    if schema is None:
+        df = process_json_to_df(_download_document(http_session, download_url, timeout), report_type)
+        if df is not None:
+            for start in range(0, len(df), batch_size):
+                yield df.iloc[start:start + batch_size].copy()
+        return
+
+    with _open_download(http_session, download_url, timeout) as response:
+        records = iter_json_records(_iter_report_text(response))
+        for _, batch in _iter_record_batches(records, batch_size, [schema['record_key']]):
+            with span('sp_api.normalize', report_type=report_type, schema=True, rows=len(batch)):
+                df = flatten_records(batch, schema['dtypes'])
+            yield df
+
+def _write_frame(engine, df, table, mode, write_method, batch_size):
+    """把一批数据写入 MySQL"""
+    clean_dataframe(df)
+    if mode == 'upsert':
+        upsert_df(engine, df, table, batch_size)
+    else:
+        write_df(engine, df, table, write_method, batch_size)
+
+async def _write_batches(queue, engine, executor, mode, write_method, batch_size, table_locks):
+    """
+    从队列取出数据批次写入 MySQL，直到取到 None；某个报告写入失败后丢弃它剩余的批次
+
+    每个表第一次成功写入之前，同一个表的批次逐个写入，避免目标表不存在时多个写入线程同时建表。
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        item = await queue.get()
+        if item is None:
+            return
+        progress, table, df = item
+        try:
+            if progress['error'] is None:
+                lock = table_locks.get(table)
+                if lock is None:
+                    await loop.run_in_executor(executor, _write_frame, engine, df, table, mode, write_method, batch_size)
+                else:
+                    async with lock:
+                        await loop.run_in_executor(executor, _write_frame, engine, df, table, mode, write_method, batch_size)
+                    table_locks.pop(table, None)  # 表已存在，之后的批次可以并发写入
+                progress['rows'] += len(df)
+        except Exception as e:
+            progress['error'] = f"写入数据时发生错误: {str(e)}"
+        finally:
+            progress['written'] += 1
+            if progress['produced'] and progress['written'] == progress['batches']:
+                progress['finished'].set()
+
+async def _pipe_report(session, request, engine, queue, download_executor, batch_size):
+    """
+    报告生成后立即流式下载，逐批放入有界队列；队列已满时下载线程等待，直到写入跟上
+
+    返回:
+    - 元组 (报告名称, 结果字典)
+    """
+    report_name = request["name"]
+    table = request.get("table", report_name)
+    body = request["body"]
+    print(f"\n开始获取 {report_name} 报告...")
+
+    result = {
+        "table": table,
+        "rows": 0,
+        "status": "failed",
+        "message": ""
+    }
+
+    report_document_id, result["message"] = await _resolve_document(session, body, report_key(body))
+    if report_document_id:
+        download_url, result["message"] = await _document_url(session, report_document_id)
+    if not report_document_id or not download_url:
+        print(f"{report_name}: {result['message']}")
+        emit('sp_api.load_report', name=report_name, table=table, status=result["status"], rows=0)
+        return report_name, result
+
+    # 有 clause 时先删除该范围内的旧数据，再写入第一批；删除单独提交，不与之后各批写入处于同一事务
+    if request.get("clause"):
+        await session.run_blocking(execute_sql, engine, f"DELETE FROM {_quote_identifier(table)} WHERE {request['clause']}")
+
+    loop = asyncio.get_running_loop()
+    progress = {'batches': 0, 'written': 0, 'rows': 0, 'produced': False, 'error': None, 'finished': asyncio.Event(), 'blocked': 0.0}
+
+    async def enqueue(df):
+        progress['batches'] += 1
+        await queue.put((progress, table, df))
+
+    def produce():
+        for df in _report_frames(session.client.session, download_url, body.get("reportType"), batch_size, session.client.timeout):
+            if progress['error'] is not None:  # 写入已失败，不再继续下载
+                break
+            put_at = time.perf_counter()
+            asyncio.run_coroutine_threadsafe(enqueue(df), loop).result()
+            progress['blocked'] += time.perf_counter() - put_at
+
+    started = time.perf_counter()
+    try:
+        await loop.run_in_executor(download_executor, produce)
+    except Exception as e:
+        progress['error'] = progress['error'] or f"下载报告时发生错误: {str(e)}"
+    progress['produced'] = True
+    if progress['written'] < progress['batches']:
+        await progress['finished'].wait()
+
+    result["rows"] = progress['rows']
+    if progress['error']:
+        result["message"] = progress['error']
+    elif progress['rows'] == 0:
+        result["message"] = "报告数据为空"
+    else:
+        result["status"] = "success"
+        result["message"] = f"已写入 {progress['rows']} 行到 {table}"
+    print(f"{report_name}: {result['message']}")
+    # blocked 为下载线程因队列已满等待写入的累计时间
+    emit('sp_api.load_report', name=report_name, table=table, status=result["status"], rows=progress['rows'],
+         batches=progress['batches'], blocked=progress['blocked'], duration=time.perf_counter() - started)
+    return report_name, result
+
+async def load_sp_api_reports_to_mysql_async(
+        report_requests,
+        database: str,
+        yaml_file_name: str = 'cfg.yaml',
+        custom_path=None,
+        mode: str = 'upsert',
+        write_method: str = 'to_sql',
+        batch_size: int = 10000,
+        queue_size: int = 8,
+        max_writers: int = 2,
+        max_downloads: int = 4,
+        max_wait_seconds=300,
+        max_workers=8,
+        endpoint=SP_API_ENDPOINT,
+        rate_limits=None,
+        client=None,
+        store_dir=None,
+        store_ttl=DEFAULT_STORE_TTL
+    ):
+    """
+    把 SP-API 报告直接流式写入 MySQL：每个报告生成后立即边下载边解析，数据批次经有界队列交给写入线程，
+    不等待其他报告，也不在内存中保留完整的报告；峰值内存约为 (queue_size + max_downloads + max_writers) 批数据
+
+    参数:
+    - report_requests: 列表或字典，格式同 fetch_sp_api_reports，另可指定
+        "table": 目标表，默认与报告名称相同
+        "clause": 写入前删除的旧数据范围（WHERE 条件）；删除先单独提交，之后写入失败时该范围可能只剩部分新数据，
+            需重新运行该报告
+    - database, yaml_file_name, custom_path: 数据库配置，同 update
+    - mode: 'upsert'（按主键/唯一索引 INSERT ... ON DUPLICATE KEY UPDATE）或 'append'（按 write_method 追加）
+    - write_method: mode='append' 时的写入方式，见 write_df
+    - batch_size: 每批记录数
+    - queue_size: 队列中最多等待写入的批数，队列满时下载暂停
+    - max_writers: 同时写入 MySQL 的连接数
+    - max_downloads: 同时下载的报告数
+    - 其余参数同 fetch_sp_api_reports_async
+
+    返回:
+    - 元组 (results, all_success)
+      results: 字典，键为报告名称，值为 {'table', 'rows', 'status', 'message'}
+      all_success: 布尔值，表示是否所有报告都成功写入
+    """
+    if mode not in PIPELINE_MODES:
+        raise ValueError(f"mode 仅支持 {list(PIPELINE_MODES)}，当前为：{mode}")
+    if write_method not in WRITE_METHODS:
+        raise ValueError(f"write_method 仅支持 {list(WRITE_METHODS)}，当前为：{write_method}")
+    if isinstance(report_requests, dict):
+        report_requests = [report_requests]
+
+    if client is None:
+        client = get_client()
+    await asyncio.to_thread(client.get_access_token, max_wait_seconds)
+    engine = get_engine(database, yaml_file_name, custom_path, local_infile=write_method == 'load_data')
+
+    results = {}
+    all_success = True
+    queue = asyncio.Queue(maxsize=queue_size)
+    table_locks = {request.get("table", request["name"]): asyncio.Lock() for request in report_requests}
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor, \
+            concurrent.futures.ThreadPoolExecutor(max_workers=max_downloads) as download_executor, \
+            concurrent.futures.ThreadPoolExecutor(max_workers=max_writers) as writer_executor:
+        session = _AsyncReportSession(client, endpoint, executor, max_wait_seconds, rate_limits, store_dir, store_ttl)
+        writers = [
+            asyncio.ensure_future(_write_batches(queue, engine, writer_executor, mode, write_method, batch_size, table_locks))
+            for _ in range(max_writers)
+        ]
+        outcomes = await asyncio.gather(
+            *(_pipe_report(session, request, engine, queue, download_executor, batch_size) for request in report_requests),
+            return_exceptions=True
+        )
+        for _ in writers:
+            await queue.put(None)
+        await asyncio.gather(*writers)
+
+    for request, outcome in zip(report_requests, outcomes):
+        if isinstance(outcome, Exception):
+            results[request["name"]] = {
+                "table": request.get("table", request["name"]),
+                "rows": 0,
+                "status": "failed",
+                "message": f"处理报告时发生错误: {str(outcome)}"
+            }
+            all_success = False
+            print(f"{results[request['name']]['message']}")
+            continue
+        name, result = outcome
+        results[name] = result
+        if result["status"] != "success":
+            all_success = False
+
+    return results, all_success
+
+def load_sp_api_reports_to_mysql(report_requests, database, **kwargs):
+    """
+    同步封装 load_sp_api_reports_to_mysql_async：把 SP-API 报告流式写入 MySQL，参数和返回值相同
+
+    发生错误时打印信息并返回 (None, False)。
+    """
+    try:
+        return _run_coroutine(load_sp_api_reports_to_mysql_async(report_requests, database, **kwargs))
+    except Exception as e:
+        print(f"写入报告过程中发生错误: {str(e)}")
+        return None, False
+
 # # 使用示例
 # # 设置起止时间 (年月日时分秒)
 # start_time = "2024-09-01T00:00:00Z"
@@ -0,0 +1,271 @@
+import posixpath
+import zipfile
+import pandas as pd
+from pandas.io.parsers import TextParser
+from xml.etree.ElementTree import iterparse
+from openpyxl.styles.numbers import BUILTIN_FORMATS, is_date_format, is_timedelta_format
+from openpyxl.utils.datetime import from_excel, CALENDAR_WINDOWS_1900, CALENDAR_MAC_1904
+
+# 直接解析工作表 XML，不构建 openpyxl 的单元格/样式对象模型；公式单元格取缓存的计算结果
+
+_REL_NS = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+_MAIN_NS = (
+    'http://schemas.openxmlformats.org/spreadsheetml/2006/main',
+    'http://purl.oclc.org/ooxml/spreadsheetml/main',
+)
+
+def _local(tag):
+    """去掉 XML 命名空间，兼容 transitional 与 strict 两种格式"""
+    return tag.rsplit('}', 1)[-1]
+
+def _column_index(letters):
+    """把列字母（如 'AB'）转换为从0开始的列号"""
+    index = 0
+    for char in letters:
+        index = index * 26 + ord(char.upper()) - 64
+    return index - 1
+
+def _read_shared_strings(zip_file):
+    """读取共享字符串表，富文本按片段拼接，忽略拼音注释"""
+    if 'xl/sharedStrings.xml' not in zip_file.namelist():
+        return []
+    strings = []
+    with zip_file.open('xl/sharedStrings.xml') as f:
+        for _, elem in iterparse(f):
+            tag = _local(elem.tag)
+            if tag == 'rPh':
+                elem.clear()
+            elif tag == 'si':
+                strings.append(''.join(t.text or '' for t in elem.iter() if _local(t.tag) == 't'))
+                elem.clear()
+    return strings
+
+def _read_date_styles(zip_file):
+    """返回数字格式为日期/时长的样式序号 {样式序号: 是否为时长格式}"""
+    if 'xl/styles.xml' not in zip_file.namelist():
+        return {}
+    custom_formats = {}
+    xf_formats = []
+    with zip_file.open('xl/styles.xml') as f:
+        in_cell_xfs = False
+        for event, elem in iterparse(f, events=('start', 'end')):
+            tag = _local(elem.tag)
+            if tag == 'cellXfs':
+                in_cell_xfs = event == 'start'
+            elif event == 'start' and tag == 'numFmt':
+                custom_formats[int(elem.get('numFmtId'))] = elem.get('formatCode')
+            elif event == 'start' and tag == 'xf' and in_cell_xfs:
+                xf_formats.append(int(elem.get('numFmtId', 0)))
+
+    date_styles = {}
+    for style_index, fmt_id in enumerate(xf_formats):
+        fmt = custom_formats.get(fmt_id, BUILTIN_FORMATS.get(fmt_id))
+        if fmt and is_date_format(fmt):
+            date_styles[style_index] = is_timedelta_format(fmt)
+    return date_styles
+
+def _read_sheet_paths(zip_file):
+    """按工作簿中的顺序返回 [(工作表名称, XML路径)]，以及是否使用1904日期系统"""
+    targets = {}
+    with zip_file.open('xl/_rels/workbook.xml.rels') as f:
+        for _, elem in iterparse(f):
+            if _local(elem.tag) == 'Relationship' and elem.get('Type', '').endswith('/worksheet'):
+                target = elem.get('Target')
+                targets[elem.get('Id')] = target.lstrip('/') if target.startswith('/') else posixpath.normpath(posixpath.join('xl', target))
+
+    sheets = []
+    date1904 = False
+    with zip_file.open('xl/workbook.xml') as f:
+        for _, elem in iterparse(f):
+            tag = _local(elem.tag)
+            if tag == 'workbookPr':
+                date1904 = elem.get('date1904') in ('1', 'true')
+            elif tag == 'sheet' and elem.get(f'{_REL_NS}id') in targets:
+                sheets.append((elem.get('name'), targets[elem.get(f'{_REL_NS}id')]))
+    return sheets, date1904
+
+def _tags(name):
+    """返回 transitional 与 strict 两种命名空间下的完整标签名"""
+    return {f'{{{ns}}}{name}' for ns in _MAIN_NS}
+
+_C_TAGS, _ROW_TAGS, _V_TAGS, _IS_TAGS = _tags('c'), _tags('row'), _tags('v'), _tags('is')
+_SHEET_DATA_TAGS = _tags('sheetData')
+
+def _iter_raw_rows(zip_file, sheet_path, shared_strings, date_styles, epoch):
+    """逐行产出 (行号, {列号: 值})，行号从1开始；空单元格和错误值不出现在字典中"""
+    column_cache = {}
+    with zip_file.open(sheet_path) as f:
+        row_number = 0
+        cells = {}
+        column = -1
+        sheet_data = None
+        for event, elem in iterparse(f, events=('start', 'end')):
+            tag = elem.tag
+            if event == 'start':
+                if tag in _SHEET_DATA_TAGS:
+                    sheet_data = elem
+                continue
+            if tag in _C_TAGS:
+                ref = elem.get('r')
+                if ref:
+                    letters = ref.rstrip('0123456789')
+                    column = column_cache.get(letters)
+                    if column is None:
+                        column = column_cache[letters] = _column_index(letters)
+                else:
+                    column += 1
+
+                value = None
+                for child in elem:
+                    if child.tag in _V_TAGS:
+                        value = child.text
+                    elif child.tag in _IS_TAGS:
+                        value = ''.join(t.text or '' for t in child.iter() if _local(t.tag) == 't')
+                if value is None:
+                    continue
+
+                cell_type = elem.get('t', 'n')
+                if cell_type == 'n':
+                    if '.' in value or 'E' in value or 'e' in value:
+                        # 与 pd.read_excel 一致：整数值的浮点数转为 int
+                        value = float(value)
+                        if value.is_integer():
+                            value = int(value)
+                    else:
+                        value = int(value)
+                    style = elem.get('s')
+                    if style is not None and date_styles and int(style) in date_styles:
+                        value = from_excel(value, epoch, timedelta=date_styles[int(style)])
+                elif cell_type == 's':
+                    value = shared_strings[int(value)]
+                elif cell_type == 'b':
+                    value = value == '1'
+                elif cell_type == 'e':
+                    continue
+                elif cell_type == 'd':
+                    value = pd.Timestamp(value).to_pydatetime()
+                cells[column] = value  # str / inlineStr 保持原样
+            elif tag in _ROW_TAGS:
+                row_attr = elem.get('r')
+                row_number = int(row_attr) if row_attr else row_number + 1
+                yield row_number, cells
+                cells = {}
+                column = -1
+                # 已处理的行从 sheetData 中移除，内存占用与行数无关
+                if sheet_data is not None:
+                    del sheet_data[:]
+                else:
+                    elem.clear()
+
+def _xlsx_columns(header):
+    """与 pd.read_excel 一致：去掉末尾的空列，空表头命名为 Unnamed: i，重复列名依次加 .1、.2 后缀"""
+    header = list(header)
+    while header and header[-1] is None:
+        header.pop()
+
+    columns = []
+    seen = set()
+    for i, name in enumerate(header):
+        name = f"Unnamed: {i}" if name is None else name
+        unique_name, count = name, 0
+        while unique_name in seen:
+            count += 1
+            unique_name = f"{name}.{count}"
+        seen.add(unique_name)
+        columns.append(unique_name)
+    return columns
+
+def _rows_to_frame(rows, columns):
+    """
+    按 pd.read_excel 的方式生成 DataFrame：空单元格填为 ''，每行补齐到表头宽度，
+    交给 pandas 的 TextParser 推断列类型（数字字符串转为数字、'NA' 等转为缺失值、超出 int64 的整数转为浮点）
+    """
+    if not rows:
+        return pd.DataFrame(columns=columns)
+    width = len(columns)
+    data = [['' if value is None else value for value in row] + [''] * (width - len(row)) for row in rows]
+    return TextParser(data, header=None, names=columns).read()
+
+def _iter_sheet(zip_file, meta, sheet, skip_rows, chunksize):
+    """读取一个工作表：跳过 skip_rows 行后的第一行作为表头，整行为空的行会被忽略，每 chunksize 行产出一个 DataFrame"""
+    shared_strings, date_styles, sheets, epoch = meta
+    if isinstance(sheet, str):
+        paths = [path for name, path in sheets if name == sheet]
+        if not paths:
+            raise KeyError(f"Worksheet {sheet} does not exist.")
+        sheet_path = paths[0]
+    else:
+        sheet_path = sheets[sheet - 1][1]
+
+    columns = None
+    batch = []
+    last_row = skip_rows
+    blank_rows = 0
+    for row_number, cells in _iter_raw_rows(zip_file, sheet_path, shared_strings, date_styles, epoch):
+        if row_number <= skip_rows:
+            continue
+        if columns is None and row_number == skip_rows + 1:
+            columns = _xlsx_columns(cells.get(i) for i in range(max(cells) + 1)) if cells else []
+            last_row = row_number
+            continue
+        if columns is None:
+            columns = []
+            last_row = skip_rows + 1
+
+        # 与 pd.read_excel 一致：数据中间的空行保留为空值行，末尾的空行去掉
+        blank_rows += row_number - last_row - 1
+        last_row = row_number
+        if not cells:
+            blank_rows += 1
+            continue
+        width = max(cells) + 1
+        if width > len(columns):
+            columns = columns + [f"Unnamed: {i}" for i in range(len(columns), width)]
+        batch.extend([()] * blank_rows)
+        blank_rows = 0
+        batch.append(tuple(cells.get(i) for i in range(width)))
+        if chunksize and len(batch) >= chunksize:
+            yield _rows_to_frame(batch, columns)
+            batch = []
+
+    if columns is not None and (batch or not chunksize):
+        yield _rows_to_frame(batch, columns)
+
+def _load_meta(zip_file):
+    """读取工作簿级别的共享字符串、日期样式和工作表列表"""
+    sheets, date1904 = _read_sheet_paths(zip_file)
+    epoch = CALENDAR_MAC_1904 if date1904 else CALENDAR_WINDOWS_1900
+    return _read_shared_strings(zip_file), _read_date_styles(zip_file), sheets, epoch
+
+def iter_xlsx_batches(file_name, sheet_num=1, skip_rows=0, chunksize=100000):
+    """
+    流式读取 XLSX 工作表，每 chunksize 行生成一个 DataFrame
+
+    跳过 skip_rows 行后的第一行作为表头，整行为空的行会被忽略。
+    """
+    with zipfile.ZipFile(file_name) as zip_file:
+        meta = _load_meta(zip_file)
+        yield from _iter_sheet(zip_file, meta, sheet_num, skip_rows, chunksize)
+
+def read_xlsx(file_name, sheet_num=1, skip_rows=0):
+    """
+    快速读取 XLSX 文件：直接流式解析工作表 XML，不加载样式对象，公式取缓存的计算结果；
+    列类型与 pd.read_excel 一样由 pandas 的 TextParser 推断
+
+    参数:
+    - file_name: 文件路径
+    - sheet_num: 工作表序号（从1开始）或名称，传入列表时一次打开文件读取多个工作表
+    - skip_rows: 表头之前跳过的行数
+
+    返回:
+    - sheet_num 为单个值时返回 DataFrame，为列表时返回 {sheet_num: DataFrame} 字典
+    """
+    sheets = sheet_num if isinstance(sheet_num, list) else [sheet_num]
+
+    frames = {}
+    with zipfile.ZipFile(file_name) as zip_file:
+        meta = _load_meta(zip_file)
+        for sheet in sheets:
+            frames[sheet] = next(_iter_sheet(zip_file, meta, sheet, skip_rows, None), pd.DataFrame())
+
+    return frames if isinstance(sheet_num, list) else frames[sheet_num]
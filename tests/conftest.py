@@ -0,0 +1,8 @@
+import os
+import sys
+
+# 不安装 datarecipe 也能运行测试；benchmarks/ 中的检查脚本同样作为测试运行
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (ROOT, os.path.join(ROOT, 'benchmarks')):
+    if path not in sys.path:
+        sys.path.insert(0, path)
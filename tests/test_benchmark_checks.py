@@ -0,0 +1,13 @@
+import pytest
+import check_import_time
+import check_json_records
+
+@pytest.mark.parametrize('statement, forbidden', check_import_time.RULES.items())
+def test_imports_stay_lazy(statement, forbidden):
+    """导入公开名称时不加载用不到的重量级依赖"""
+    result = check_import_time.measure_import(statement, repeat=1)
+    assert [module for module in result['modules'] if module in forbidden] == []
+
+def test_iter_json_records_matches_json_loads():
+    checked, failures = check_json_records.run_checks(iterations=30, seed=0)
+    assert checked and failures == []
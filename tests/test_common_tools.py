@@ -0,0 +1,68 @@
+import json
+import random
+import zipfile
+import pandas as pd
+import pytest
+from datarecipe import common_tools
+from datarecipe.common_tools import detect_encoding, local_to_df, df_to_csv
+
+_CJK = '销售额订单客户退货产品名称地区城市省份仓库库存数量单价金额日期备注状态'
+
+def _cjk_rows(count, seed=0):
+    rng = random.Random(seed)
+    return [f"{i},{''.join(rng.choice(_CJK) for _ in range(rng.randint(1, 12)))},{rng.randint(0, 999)}" for i in range(count)]
+
+def test_detect_encoding_utf8_sample_cut_inside_character(tmp_path):
+    """抽样片段的结尾落在多字节字符中间时仍能识别 UTF-8"""
+    file_name = tmp_path / 'utf8.csv'
+    file_name.write_bytes(('编号,名称,数量\n' + '\n'.join(_cjk_rows(20000)) + '\n').encode('utf-8'))
+    assert file_name.stat().st_size > 3 * 65536
+    assert detect_encoding(file_name) == 'utf-8'
+
+def test_detect_encoding_gb18030_at_every_byte_shift(tmp_path):
+    """GB18030 文件整体偏移若干字节后，抽样边界落在双字节字符中间时仍能识别"""
+    data = ('名称,数量\n' + '\n'.join(_cjk_rows(20000)) + '\n').encode('gb18030')
+    for shift in range(1, 6):
+        file_name = tmp_path / f'gb{shift}.csv'
+        file_name.write_bytes(b'a' * shift + data)
+        assert detect_encoding(file_name) == 'GB18030'
+
+def test_local_to_df_reads_detected_encoding(tmp_path):
+    rows = _cjk_rows(20000)
+    (tmp_path / 'sales.csv').write_bytes(('id,name,qty\n' + '\n'.join(rows) + '\n').encode('gb18030'))
+    df = local_to_df(str(tmp_path), 'sales')
+    assert df['name'].tolist() == [row.split(',')[1] for row in rows]
+
+def test_encoding_cache_is_opt_in_and_bounded(tmp_path, monkeypatch):
+    """默认不写缓存；指定缓存文件后最多保留 ENCODING_CACHE_MAX_ENTRIES 个文件"""
+    monkeypatch.setenv('HOME', str(tmp_path / 'home'))
+    monkeypatch.setattr(common_tools, 'ENCODING_CACHE_MAX_ENTRIES', 2)
+    data_dir = tmp_path / 'data'
+    data_dir.mkdir()
+    for i in range(3):
+        pd.DataFrame({'a': [i]}).to_csv(data_dir / f'sales_{i}.csv', index=False)
+
+    local_to_df(str(data_dir), 'sales')
+    assert not (tmp_path / 'home').exists()
+
+    cache_path = tmp_path / 'cache' / 'encoding_cache.json'
+    local_to_df(str(data_dir), 'sales', encoding_cache=str(cache_path))
+    assert len(json.loads(cache_path.read_text(encoding='utf-8'))) == 2
+
+def test_low_confidence_encoding_is_not_cached(tmp_path, monkeypatch):
+    monkeypatch.setattr(common_tools, 'MIN_ENCODING_CONFIDENCE', 1.01)
+    pd.DataFrame({'a': [1]}).to_csv(tmp_path / 'sales.csv', index=False)
+    cache_path = tmp_path / 'encoding_cache.json'
+    df = local_to_df(str(tmp_path), 'sales', encoding_cache=str(cache_path))
+    assert df['a'].tolist() == [1]
+    assert not cache_path.exists()
+
+@pytest.mark.parametrize('file_name, compression', [('out', 'zip'), ('out.csv.zip', 'infer')])
+def test_df_to_csv_zip_member_named_after_target(tmp_path, file_name, compression):
+    """zip 内的文件名取目标文件名，而不是原子写入用的临时文件名"""
+    df = pd.DataFrame({'a': [1, 2], 'b': ['x', 'y']})
+    df_to_csv(df, str(tmp_path), file_name, compression=compression)
+    with zipfile.ZipFile(tmp_path / 'out.csv.zip') as archive:
+        assert archive.namelist() == ['out.csv']
+    pd.testing.assert_frame_equal(pd.read_csv(tmp_path / 'out.csv.zip'), df)
+    assert [path.name for path in tmp_path.iterdir()] == ['out.csv.zip']
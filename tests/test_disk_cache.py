@@ -0,0 +1,47 @@
+import os
+import time
+import pandas as pd
+from datarecipe.query_cache import store_result, evict_query_cache
+from datarecipe.report_store import save_report_state, store_report_data, evict_report_store
+from datarecipe.disk_cache import ORPHAN_GRACE_SECONDS
+
+def _age(path, seconds):
+    """把文件的修改时间调早 seconds 秒"""
+    mtime = time.time() - seconds
+    os.utime(path, (mtime, mtime))
+
+def test_evict_report_store_removes_expired_and_orphaned(tmp_path):
+    """从未下载完成的过期报告和没有状态文件的数据也会被删除，未过期的未完成报告保留"""
+    df = pd.DataFrame({'a': range(100)})
+    save_report_state(tmp_path, 'stale', body={}, ttl=60, created=time.time() - 120)
+    save_report_state(tmp_path, 'pending', body={}, ttl=60)
+    store_report_data(tmp_path, 'expired', df)
+    save_report_state(tmp_path, 'expired', created=time.time() - 120, ttl=60)
+    store_report_data(tmp_path, 'fresh', df)
+    df.to_parquet(tmp_path / 'orphan.parquet')
+    _age(tmp_path / 'orphan.parquet', ORPHAN_GRACE_SECONDS + 1)
+
+    evict_report_store(tmp_path)
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['fresh.json', 'fresh.parquet', 'pending.json']
+
+def test_evict_report_store_counts_state_files(tmp_path):
+    df = pd.DataFrame({'a': range(100)})
+    store_report_data(tmp_path, 'report', df)
+    data_bytes = os.path.getsize(tmp_path / 'report.parquet')
+    evict_report_store(tmp_path, max_bytes=data_bytes)
+    assert not (tmp_path / 'report.parquet').exists()
+
+def test_evict_query_cache_removes_expired_and_orphaned(tmp_path):
+    df = pd.DataFrame({'a': [1, 2]})
+    store_result(tmp_path, 'short', df, 'SELECT 1', ttl=0.01)
+    store_result(tmp_path, 'long', df, 'SELECT 2', ttl=3600)
+    df.to_parquet(tmp_path / 'no_meta.parquet')
+    (tmp_path / 'no_data.json').write_text('{"created": 0}', encoding='utf-8')
+    (tmp_path / 'recent.json').write_text('{"created": 0}', encoding='utf-8')
+    for name in ('no_meta.parquet', 'no_data.json'):
+        _age(tmp_path / name, ORPHAN_GRACE_SECONDS + 1)
+    time.sleep(0.05)
+
+    evict_query_cache(tmp_path, ttl=float('inf'))
+    # recent.json 可能正在被其他进程写入，宽限期内保留
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['long.json', 'long.parquet', 'recent.json']
@@ -0,0 +1,62 @@
+import threading
+import concurrent.futures
+import pandas as pd
+import pytest
+import sqlalchemy
+from datarecipe import mysql
+from datarecipe.mysql import sql_query, sql_query_to_file
+
+@pytest.fixture
+def engine(tmp_path_factory, monkeypatch):
+    """用 SQLite 代替 MySQL，只替换 get_engine"""
+    engine = sqlalchemy.create_engine(f"sqlite:///{tmp_path_factory.mktemp('db') / 'test.db'}")
+    monkeypatch.setattr(mysql, 'get_engine', lambda *args, **kwargs: engine)
+    pd.DataFrame({'id': [1, 2], 'qty': [10, 20]}).to_sql('sales', engine, index=False)
+    yield engine
+    engine.dispose()
+
+def test_sql_query_passes_params_to_other_statements(engine):
+    sql_query('db', "UPDATE sales SET qty = ? WHERE id = ?", params=(99, 2))
+    sql_query('db', "DELETE FROM sales WHERE id = ?", params=(1,))
+    assert sql_query('db', "SELECT id, qty FROM sales").values.tolist() == [[2, 99]]
+
+def test_sql_query_skips_cache_when_tables_are_unknown(engine, tmp_path):
+    """无法可靠识别所查询的表时不缓存，写入后立即能查到新数据"""
+    with engine.begin() as conn:
+        conn.exec_driver_sql("CREATE INDEX idx_id ON sales (id)")
+    sql = "SELECT SUM(qty) AS total FROM sales INDEXED BY idx_id"
+    assert sql_query('db', sql, cache_dir=str(tmp_path))['total'].tolist() == [30]
+    sql_query('db', "UPDATE sales SET qty = ? WHERE id = ?", params=(5, 1))
+    assert sql_query('db', sql, cache_dir=str(tmp_path))['total'].tolist() == [25]
+    assert not list(tmp_path.iterdir())
+
+@pytest.mark.parametrize('suffix', ['csv', 'parquet'])
+def test_sql_query_to_file_writes_empty_result(engine, tmp_path, suffix):
+    """结果为空时仍写出带表头/schema 的文件，不留下临时文件"""
+    file_path = tmp_path / f'out.{suffix}'
+    assert sql_query_to_file('db', "SELECT id, qty FROM sales WHERE id > 5", str(file_path)) == 0
+    df = pd.read_csv(file_path) if suffix == 'csv' else pd.read_parquet(file_path)
+    assert list(df.columns) == ['id', 'qty'] and df.empty
+    assert [path.name for path in tmp_path.iterdir()] == [file_path.name]
+
+def test_sql_query_to_file_without_chunks_writes_valid_parquet(tmp_path, monkeypatch):
+    monkeypatch.setattr(mysql, 'iter_sql_query', lambda *args, **kwargs: iter([]))
+    file_path = tmp_path / 'out.parquet'
+    assert sql_query_to_file('db', "SELECT 1", str(file_path)) == 0
+    assert pd.read_parquet(file_path).empty
+
+def test_concurrent_sql_query_to_file_same_target(tmp_path, monkeypatch):
+    """两个导出同时写到同一路径时各自使用唯一的临时文件，最终文件完整"""
+    barrier = threading.Barrier(2)
+
+    def iter_sql_query(*args, **kwargs):
+        yield pd.DataFrame({'id': [1]})
+        barrier.wait(timeout=10)  # 两个导出都写完第一块后再写第二块
+        yield pd.DataFrame({'id': [2]})
+
+    monkeypatch.setattr(mysql, 'iter_sql_query', iter_sql_query)
+    file_path = tmp_path / 'out.csv'
+    with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+        list(executor.map(lambda _: sql_query_to_file('db', "SELECT id FROM sales", str(file_path)), range(2)))
+    assert pd.read_csv(file_path)['id'].tolist() == [1, 2]
+    assert [path.name for path in tmp_path.iterdir()] == ['out.csv']
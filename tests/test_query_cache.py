@@ -0,0 +1,25 @@
+import pytest
+from datarecipe.query_cache import referenced_tables
+
+@pytest.mark.parametrize('sql, tables', [
+    ("SELECT * FROM a, b WHERE a.id = b.id", [(None, 'a'), (None, 'b')]),
+    ("SELECT * FROM db.a AS x, `b` y JOIN c ON x.id = c.id LEFT JOIN d USING (id), e", [('db', 'a'), (None, 'b'), (None, 'c'), (None, 'd'), (None, 'e')]),
+    ("SELECT * FROM (SELECT id FROM a) t, b", [(None, 'a'), (None, 'b')]),
+    ("SELECT (SELECT MAX(v) FROM m) AS mx FROM n WHERE id IN (SELECT id FROM z)", [(None, 'm'), (None, 'n'), (None, 'z')]),
+    ("SELECT * FROM a UNION ALL SELECT * FROM b ORDER BY 1", [(None, 'a'), (None, 'b')]),
+    ("SELECT EXTRACT(YEAR FROM d), TRIM(LEADING 'x' FROM s) FROM sales", [(None, 'sales')]),
+    ("SELECT * FROM a WHERE note = 'x FROM fake, y' /* FROM ghost */ -- FROM ghost", [(None, 'a')]),
+    ("SELECT 1", []),
+])
+def test_referenced_tables(sql, tables):
+    assert referenced_tables(sql) == tables
+
+@pytest.mark.parametrize('sql', [
+    "SELECT * FROM a PARTITION (p0), b",
+    "SELECT * FROM a USE INDEX (i), b",
+    "SELECT * FROM (a, b)",
+    "SELECT * FROM JSON_TABLE(doc, '$[*]' COLUMNS (id INT PATH '$.id')) j",
+])
+def test_referenced_tables_unreliable(sql):
+    """无法可靠识别表名时返回 None，而不是只返回一部分表"""
+    assert referenced_tables(sql) is None
@@ -0,0 +1,50 @@
+import datetime
+import pandas as pd
+import pytest
+from openpyxl import Workbook
+from datarecipe.xlsx_reader import read_xlsx, iter_xlsx_batches
+
+COLUMNS = {
+    'numeric_text': ['1', '2', '3', '4', '5'],
+    'numeric_text_blank': ['1', 2, '3.5', None, '7'],
+    'bool': [True, False, True, False, True],
+    'bool_blank': [True, None, False, True, None],
+    'int_overflow': [2 ** 70, 1, 2, 3, 4],
+    'int_blank': [1, None, 3, 4, 5],
+    'float': [1.5, 2, None, 4, 5],
+    'date': [datetime.datetime(2024, 1, d) for d in range(1, 6)],
+    'date_blank': [datetime.datetime(2024, 1, 1), None, datetime.datetime(2024, 1, 3), None, None],
+    'text': ['a', None, 'NA', 'x', 'null'],
+    'mixed': ['a', 1, 2.5, True, None],
+    'bool_text': ['TRUE', 'False', 'true', 'FALSE', 'true'],
+    'long_numeric_text': ['99999999999999999999', '1', '2', '3', '4'],
+    None: [None, None, 1, None, None],
+}
+
+@pytest.fixture
+def workbook(tmp_path):
+    """表头前有一行标题，数据中间有一个空行，末尾有空行"""
+    file_name = tmp_path / 'book.xlsx'
+    wb = Workbook()
+    ws = wb.active
+    ws.append(['report title'])
+    ws.append(list(COLUMNS))
+    for i in range(5):
+        ws.append([values[i] for values in COLUMNS.values()])
+        if i == 2:
+            ws.append([])
+    ws.append([])
+    wb.save(file_name)
+    return file_name
+
+def test_read_xlsx_matches_read_excel(workbook):
+    pd.testing.assert_frame_equal(read_xlsx(workbook, skip_rows=1), pd.read_excel(workbook, skiprows=1))
+    pd.testing.assert_frame_equal(read_xlsx(workbook), pd.read_excel(workbook))
+
+def test_iter_xlsx_batches_splits_rows(workbook):
+    expected = pd.read_excel(workbook, skiprows=1)
+    batches = list(iter_xlsx_batches(workbook, skip_rows=1, chunksize=2))
+    assert len(batches) > 1
+    for column in ('text', 'numeric_text', 'bool_text'):
+        values = pd.concat([batch[column] for batch in batches], ignore_index=True)
+        pd.testing.assert_series_equal(values, expected[column], check_dtype=False)